@@ -1,12 +1,246 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Mapping, Callable, Optional, Iterable, AsyncIterator, Awaitable, TypeVar
 from abc import ABC, abstractmethod
+import asyncio
+import atexit
+import copy
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import MappingProxyType
 import json
+import logging
+import threading
+import time
 from datetime import datetime
 
+import fastjsonschema
+import httpx
+
+from utils.validators import get_output_validator
+
+
+# ReAct trace goes through logging (DEBUG level) rather than print, so concurrent
+# agents never contend on stdout; setup_logger makes emission non-blocking
+logger = logging.getLogger(__name__)
+
+# Agents hand file writes to this single worker thread so disk I/O stays off the
+# workflow path; call wait_for_background_writes() before relying on the files.
+_background_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='agent-writer')
+_pending_writes: List[Future] = []
+_pending_writes_lock = threading.Lock()
+
+
+def wait_for_background_writes(timeout: Optional[float] = None):
+    """
+    Block until all queued background writes have finished
+    
+    Writes are best-effort (caches and local copies of results), so a failed
+    write is logged rather than raised and does not fail the workflow.
+    
+    Args:
+        timeout: Maximum seconds to wait for each write
+    """
+    with _pending_writes_lock:
+        futures = list(_pending_writes)
+        _pending_writes.clear()
+    
+    for future in futures:
+        try:
+            future.result(timeout=timeout)
+        except Exception as e:
+            logger.warning(f"Background write failed: {e}")
+
+
+T = TypeVar('T')
+
+# Async agent work runs on one long-lived event loop in a daemon thread. Pooled
+# connections belong to the loop that opened them, so keeping a single loop lets
+# the shared HTTP client reuse connections across steps instead of losing them
+# with every asyncio.run().
+_event_loop: Optional[asyncio.AbstractEventLoop] = None
+_event_loop_lock = threading.Lock()
+
+
+def _get_event_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared agent event loop, starting its thread on first use"""
+    global _event_loop
+    if _event_loop is None:
+        with _event_loop_lock:
+            if _event_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='agent-event-loop', daemon=True).start()
+                _event_loop = loop
+    return _event_loop
+
+
+def run_async(coro: Awaitable[T]) -> T:
+    """
+    Run a coroutine on the shared agent event loop and wait for its result
+    
+    May be called from any thread other than the loop's own, so several
+    workflow threads can drive async agents at once.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_event_loop()).result()
+
+
+# Pool sizing, timeout and retry policy for the shared HTTP client
+HTTP_POOL_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=20)
+HTTP_TIMEOUT = 30
+HTTP_MAX_RETRIES = 3
+HTTP_BACKOFF_FACTOR = 0.3
+HTTP_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+_http_client: Optional[httpx.AsyncClient] = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the process-wide HTTP client, creating it on first use
+    
+    Connections, DNS lookups and TLS sessions are reused by every agent.
+    Only use it from coroutines running under run_async().
+    """
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                # The transport retries failed connects; request_with_retry handles bad statuses
+                transport = httpx.AsyncHTTPTransport(retries=HTTP_MAX_RETRIES, limits=HTTP_POOL_LIMITS)
+                _http_client = httpx.AsyncClient(timeout=HTTP_TIMEOUT, transport=transport)
+                atexit.register(_close_http_client)
+    return _http_client
+
+
+def _close_http_client():
+    """Close the shared HTTP client's connections at interpreter exit"""
+    if _http_client is not None and _event_loop is not None and _event_loop.is_running():
+        run_async(_http_client.aclose())
+
+
+async def request_with_retry(method: str, url: str, **kwargs: Any) -> httpx.Response:
+    """Send a request on the shared client, backing off on rate limits and transient server errors"""
+    client = get_http_client()
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        response = await client.request(method, url, **kwargs)
+        if response.status_code not in HTTP_RETRY_STATUSES or attempt == HTTP_MAX_RETRIES:
+            return response
+        await asyncio.sleep(HTTP_BACKOFF_FACTOR * (2 ** attempt))
+    return response
+
+
+# Upper bound on items a streaming stage works on (or buffers) at once
+STREAM_MAX_IN_FLIGHT = 32
+
+# Marks the end of a stream passed through an asyncio.Queue
+_STREAM_END = object()
+
+
+async def iterate_items(items: Iterable[Any]) -> AsyncIterator[Any]:
+    """Expose a plain iterable as an async stream"""
+    for item in items:
+        yield item
+
+
+async def map_concurrent(items: AsyncIterator[Any], func: Callable[[Any], Awaitable[Any]],
+                         limit: int = STREAM_MAX_IN_FLIGHT) -> AsyncIterator[Any]:
+    """
+    Apply an async function to each item as it arrives
+    
+    Results are yielded in input order, so the output lines up with the
+    input, while a consumer can still start on early results as later items
+    are being fetched upstream. At most `limit` items are running or waiting
+    to be yielded at once.
+    """
+    semaphore = asyncio.Semaphore(limit)
+    # Tasks in input order; a slot is freed once its result is ready, just before it is yielded
+    tasks: asyncio.Queue = asyncio.Queue()
+    
+    async def feed():
+        try:
+            async for item in items:
+                await semaphore.acquire()
+                await tasks.put((asyncio.ensure_future(func(item)), None))
+            await tasks.put((_STREAM_END, None))
+        except Exception as e:
+            await tasks.put((_STREAM_END, e))
+    
+    feeder = asyncio.create_task(feed())
+    current = None
+    try:
+        while True:
+            current, error = await tasks.get()
+            if error is not None:
+                raise error
+            if current is _STREAM_END:
+                break
+            try:
+                result = await current
+            finally:
+                semaphore.release()
+            yield result
+    finally:
+        # On early exit (an error here or downstream), stop feeding, cancel every
+        # item still running and wait for them before closing the source
+        in_flight = [feeder]
+        if isinstance(current, asyncio.Future):
+            in_flight.append(current)
+        while not tasks.empty():
+            task, _ = tasks.get_nowait()
+            if task is not _STREAM_END:
+                in_flight.append(task)
+        for task in in_flight:
+            task.cancel()
+        await asyncio.gather(*in_flight, return_exceptions=True)
+        await items.aclose()
+
+
+async def buffered(source: AsyncIterator[Any], maxsize: int = STREAM_MAX_IN_FLIGHT) -> AsyncIterator[Any]:
+    """
+    Decouple a stream from its consumer with a bounded queue
+    
+    The source keeps producing until `maxsize` items are waiting, which
+    bounds memory between pipeline stages without stalling the producer on
+    every item.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize)
+    
+    async def pump():
+        try:
+            async for item in source:
+                await queue.put((item, None))
+            await queue.put((_STREAM_END, None))
+        except Exception as e:
+            await queue.put((_STREAM_END, e))
+    
+    pump_task = asyncio.create_task(pump())
+    try:
+        while True:
+            item, error = await queue.get()
+            if error is not None:
+                raise error
+            if item is _STREAM_END:
+                break
+            yield item
+    finally:
+        pump_task.cancel()
+        await asyncio.gather(pump_task, return_exceptions=True)
+        await source.aclose()
+
 
 class BaseAgent(ABC):
     """Base class for all workflow agents"""
     
+    # Agents that cache API responses skip their caches when this is False
+    use_cache = True
+    
+    # Streaming agents (see StreamingAgent) name the list input they handle one
+    # item at a time and their matching output list here. The builder uses this
+    # to pipeline consecutive streaming steps.
+    stream_input: Optional[str] = None
+    stream_output: Optional[str] = None
+    # Type (with a from_dict classmethod) the builder converts each stream_input
+    # item into before the agent sees it; None passes the dicts through
+    stream_record_type: Optional[type] = None
+    
     def __init__(self, step_config: Dict[str, Any], tools_config: Dict[str, Any]):
         """
         Initialize agent
@@ -22,30 +256,68 @@ class BaseAgent(ABC):
         self.inputs = step_config.get('inputs', {})
         self.output_schema = step_config.get('output_schema', {})
         
+        # Schemas are static per step, so fetch the compiled validator once up front
+        self._output_validator = get_output_validator(self.output_schema)
+        
+        self._init_reasoning_log()
+    
+    def _init_reasoning_log(self):
+        """Start an empty reasoning log"""
         # ReAct prompting components
         self.thoughts: List[str] = []
         self.actions: List[Dict[str, Any]] = []
         self.observations: List[str] = []
+        
+        # Read-only view over the live lists above, built once and returned by get_reasoning_log
+        self._reasoning_log = MappingProxyType({
+            'thoughts': self.thoughts,
+            'actions': self.actions,
+            'observations': self.observations
+        })
+    
+    def for_run(self) -> 'BaseAgent':
+        """
+        Return a copy of this agent with an empty reasoning log, for one run
+        
+        The copy shares everything built at construction time (tools config,
+        compiled validator, API clients, caches), while the reasoning log
+        belongs to the run alone, so runs executing at once cannot interleave
+        or wipe each other's logs.
+        """
+        run_agent = copy.copy(self)
+        run_agent._init_reasoning_log()
+        return run_agent
     
     def think(self, thought: str):
         """Record a reasoning thought (ReAct pattern)"""
         self.thoughts.append(thought)
-        print(f"[THINK] {thought}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"[THINK] {self.agent_name}: {thought}")
     
     def act(self, action: str, details: Dict[str, Any] = None):
         """Record an action taken (ReAct pattern)"""
+        # Epoch nanoseconds; cheap to take per action and formatted only if ever displayed
         action_record = {
             'action': action,
             'details': details or {},
-            'timestamp': datetime.now().isoformat()
+            'timestamp': time.time_ns()
         }
         self.actions.append(action_record)
-        print(f"[ACT] {action}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"[ACT] {self.agent_name}: {action}")
     
     def observe(self, observation: str):
         """Record an observation from action results (ReAct pattern)"""
         self.observations.append(observation)
-        print(f"[OBSERVE] {observation}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"[OBSERVE] {self.agent_name}: {observation}")
+    
+    def write_in_background(self, func: Callable[..., Any], *args: Any) -> Future:
+        """Queue a file write on the shared background writer thread"""
+        future = _background_writer.submit(func, *args)
+        with _pending_writes_lock:
+            _pending_writes.append(future)
+        return future
     
     @abstractmethod
     def execute(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
@@ -60,13 +332,14 @@ class BaseAgent(ABC):
         """
         pass
     
-    def get_reasoning_log(self) -> Dict[str, Any]:
-        """Get complete reasoning log (thoughts, actions, observations)"""
-        return {
-            'thoughts': self.thoughts,
-            'actions': self.actions,
-            'observations': self.observations
-        }
+    def get_reasoning_log(self) -> Mapping[str, Any]:
+        """
+        Get complete reasoning log (thoughts, actions, observations)
+        
+        Returns a read-only view over the agent's own lists, so nothing is
+        copied; callers that need to modify the log should copy it first.
+        """
+        return self._reasoning_log
     
     def validate_output(self, output: Dict[str, Any]) -> bool:
         """
@@ -78,11 +351,12 @@ class BaseAgent(ABC):
         Returns:
             True if valid
         """
-        for key in self.output_schema.keys():
-            if key not in output:
-                print(f"⚠️  Warning: Missing expected output key: {key}")
-                return False
-        return True
+        try:
+            self._output_validator(output)
+            return True
+        except fastjsonschema.JsonSchemaException as e:
+            logger.warning(f"{self.agent_name} output does not match schema: {e.message}")
+            return False
     
     def log_execution(self, success: bool, output: Any = None, error: str = None):
         """Log execution results"""
@@ -91,7 +365,8 @@ class BaseAgent(ABC):
             'step_id': self.step_id,
             'timestamp': datetime.now().isoformat(),
             'success': success,
-            'reasoning': self.get_reasoning_log()
+            # A snapshot: the live view is not serializable and changes on the next run
+            'reasoning': {key: list(entries) for key, entries in self._reasoning_log.items()}
         }
         
         if success:
@@ -102,6 +377,53 @@ class BaseAgent(ABC):
         return log_entry
 
 
+class StreamingAgent(BaseAgent):
+    """
+    Base class for agents that handle a list input one item at a time
+    
+    Subclasses set stream_input and stream_output and implement astream()
+    (and, if the output needs more than the list, collect()).
+    """
+    
+    @abstractmethod
+    async def astream(self, items: AsyncIterator[Dict[str, Any]],
+                      inputs: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process items one at a time, yielding results as soon as each is ready
+        
+        Args:
+            items: Stream of `stream_input` items (possibly from the previous step)
+            inputs: Remaining resolved inputs for this step
+            
+        Returns:
+            Async iterator of `stream_output` items
+        """
+        pass
+    
+    def collect(self, results: List[Dict[str, Any]], inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build the step output from the items produced by astream()
+        
+        Args:
+            results: Every item astream() yielded, in arrival order
+            inputs: Resolved inputs for this step
+            
+        Returns:
+            Output data matching the output_schema
+        """
+        output = {self.stream_output: results}
+        self.validate_output(output)
+        return output
+    
+    def execute_stream(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Run astream() over the step's own input list and collect the output"""
+        async def run():
+            items = iterate_items(inputs.get(self.stream_input, []))
+            return [result async for result in self.astream(items, inputs)]
+        
+        return self.collect(run_async(run()), inputs)
+
+
 # Import all agents for easy access
 from .prospect_search import ProspectSearchAgent
 from .enrichment import DataEnrichmentAgent
@@ -113,6 +435,11 @@ from .feedback_trainer import FeedbackTrainerAgent
 
 __all__ = [
     'BaseAgent',
+    'StreamingAgent',
+    'wait_for_background_writes',
+    'run_async',
+    'get_http_client',
+    'request_with_retry',
     'ProspectSearchAgent',
     'DataEnrichmentAgent',
     'ScoringAgent',
@@ -1,43 +1,173 @@
-from typing import Dict, Any, List
-import requests
-from . import BaseAgent
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator
+from collections import OrderedDict
+import asyncio
+import os
+import random
+import threading
+import time
+import orjson
+from . import StreamingAgent, map_concurrent, request_with_retry
+from .types import Lead
 
 
-class DataEnrichmentAgent(BaseAgent):
+# Maximum number of in-flight Clearbit requests (keeps us inside the rate limit)
+CLEARBIT_MAX_CONCURRENCY = 10
+
+# Per-request timeout for Clearbit lookups (seconds)
+CLEARBIT_TIMEOUT = 10
+
+# Company lookups are cached per domain; entries older than half the TTL are
+# still served but refreshed in the background (stale-while-revalidate)
+CLEARBIT_CACHE_TTL = 86_400
+CLEARBIT_CACHE_MAXSIZE = 10_000
+
+# Domains Clearbit has answered 404 for, kept across runs so they are never re-requested
+CLEARBIT_MISSES_FILE = 'data/clearbit_misses.json'
+
+# Mock technology stacks by company type
+_TECH_STACKS = {
+    'default': ('Salesforce', 'HubSpot', 'Slack', 'Google Workspace'),
+    'saas': ('AWS', 'React', 'PostgreSQL', 'Redis', 'Docker'),
+    'enterprise': ('Microsoft Azure', 'SAP', 'Oracle', 'Tableau')
+}
+
+# News templates are formatted only after one has been picked
+_MOCK_NEWS_TEMPLATES = (
+    "{company} announces Q4 growth of 25%",
+    "{company} expands sales team with 15 new hires",
+    "{company} raises Series B funding",
+    "{company} launches new product line",
+    "{company} opens new office in San Francisco"
+)
+_NEWS_TEMPLATES = (
+    "{company} reports strong quarterly earnings",
+    "{company} expands into new markets",
+    "{company} announces strategic partnership",
+    "{company} releases innovative product update"
+)
+
+_company_cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_company_cache_lock = threading.Lock()
+
+# Background refreshes of stale cache entries by domain. Steps don't wait for
+# them; they finish on the shared event loop, which only ever touches this dict.
+_refreshing: Dict[str, asyncio.Task] = {}
+
+
+def _get_cached_company(domain: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+    """Return (fetched_at, company) for a domain, or None if missing or expired"""
+    with _company_cache_lock:
+        entry = _company_cache.get(domain)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > CLEARBIT_CACHE_TTL:
+            del _company_cache[domain]
+            return None
+        return entry
+
+
+def _store_cached_company(domain: str, company: Dict[str, Any]):
+    """Cache company data for a domain, evicting the oldest entry when full"""
+    with _company_cache_lock:
+        _company_cache[domain] = (time.monotonic(), company)
+        _company_cache.move_to_end(domain)
+        if len(_company_cache) > CLEARBIT_CACHE_MAXSIZE:
+            _company_cache.popitem(last=False)
+
+
+def _refresh_done(domain: str, task: asyncio.Task):
+    """Forget a finished refresh; a failed one just leaves the stale entry in place"""
+    _refreshing.pop(domain, None)
+    if not task.cancelled():
+        task.exception()
+
+
+def _load_clearbit_misses() -> set:
+    """Read the persisted set of domains Clearbit has no data for"""
+    try:
+        with open(CLEARBIT_MISSES_FILE, 'rb') as f:
+            return set(orjson.loads(f.read()))
+    except (OSError, orjson.JSONDecodeError):
+        return set()
+
+
+def _write_clearbit_misses(domains: List[str]):
+    """Persist the known-missing domains (runs on the background writer)"""
+    os.makedirs(os.path.dirname(CLEARBIT_MISSES_FILE), exist_ok=True)
+    with open(CLEARBIT_MISSES_FILE, 'wb') as f:
+        f.write(orjson.dumps(domains))
+
+
+class DataEnrichmentAgent(StreamingAgent):
     """
     Agent responsible for enriching lead data with additional information
     Uses Clearbit API (or mock enrichment if API unavailable)
     """
     
+    def __init__(self, step_config: Dict[str, Any], tools_config: Dict[str, Any]):
+        super().__init__(step_config, tools_config)
+        
+        self._rng = random.Random()
+        
+        # Domains to skip without a request; saved again only if a run adds to it
+        self._negative_domains = _load_clearbit_misses()
+        self._negative_domains_changed = False
+    
+    stream_input = 'leads'
+    stream_output = 'enriched_leads'
+    stream_record_type = Lead
+    
     def execute(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
         """
         Enrich leads with additional company and contact data
         
         Args:
-            inputs: Contains 'leads' from previous step
+            inputs: Contains 'leads' (Lead records) from previous step
             
         Returns:
             Dictionary with 'enriched_leads' array
         """
+        return self.execute_stream(inputs)
+    
+    async def astream(self, leads: AsyncIterator[Lead], inputs: Dict[str, Any]) -> AsyncIterator[Dict]:
+        """Enrich leads as they arrive, yielding them in input order as soon as each is ready"""
         self.think("Starting data enrichment for leads")
         
-        leads = inputs.get('leads', [])
-        self.think(f"Enriching {len(leads)} leads")
+        api_key = self.tools_config.get('Clearbit', {}).get('api_key')
         
-        enriched_leads = []
+        # Without Clearbit every lead gets mock enrichment
+        if not api_key or api_key == '':
+            async for lead in leads:
+                yield self._mock_enrich_lead(lead)
+            return
         
-        for lead in leads:
-            self.act(f"Enriching data for {lead.get('company')}")
-            
-            # Try Clearbit API
-            enriched_data = self._enrich_with_clearbit(lead)
-            
-            # If API fails, use mock enrichment
-            if not enriched_data:
-                enriched_data = self._mock_enrich_lead(lead)
-            
-            enriched_leads.append(enriched_data)
+        semaphore = asyncio.Semaphore(CLEARBIT_MAX_CONCURRENCY)
+        headers = {
+            'Authorization': f'Bearer {api_key}'
+        }
         
+        # In-flight company lookups by domain, so leads sharing a domain share one request
+        pending: Dict[str, asyncio.Task] = {}
+        
+        async def enrich(lead: Lead) -> Dict:
+            # Fall back to mock enrichment wherever the API gave us nothing
+            enriched = await self._enrich_with_clearbit(headers, semaphore, pending, lead)
+            return enriched or self._mock_enrich_lead(lead)
+        
+        results = map_concurrent(leads, enrich)
+        try:
+            async for enriched in results:
+                yield enriched
+        finally:
+            # Closing the stream early cancels the lookups still in flight
+            await results.aclose()
+        
+        if self._negative_domains_changed:
+            self.write_in_background(_write_clearbit_misses, sorted(self._negative_domains))
+            self._negative_domains_changed = False
+    
+    def collect(self, enriched_leads: List[Dict], inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the step output from the enriched leads"""
         self.observe(f"Successfully enriched {len(enriched_leads)} leads")
         
         output = {'enriched_leads': enriched_leads}
@@ -45,95 +175,98 @@ class DataEnrichmentAgent(BaseAgent):
         
         return output
     
-    def _enrich_with_clearbit(self, lead: Dict) -> Dict:
+    async def _enrich_with_clearbit(self, headers: Dict[str, str], semaphore: asyncio.Semaphore,
+                                    pending: Dict[str, asyncio.Task], lead: Lead) -> Optional[Dict]:
         """Enrich using Clearbit API"""
-        if 'Clearbit' not in self.tools_config:
-            return None
-        
-        api_config = self.tools_config['Clearbit']
-        api_key = api_config.get('api_key')
-        
-        if not api_key or api_key == '':
-            return None
+        self.act(f"Enriching data for {lead.company}")
         
         try:
             # Clearbit Enrichment API
-            company_domain = lead.get('email', '').split('@')[-1]
-            
-            headers = {
-                'Authorization': f'Bearer {api_key}'
-            }
+            company_domain = lead.email.split('@')[-1].lower()
             
-            # Company enrichment
-            response = requests.get(
-                f'https://company.clearbit.com/v2/companies/find?domain={company_domain}',
-                headers=headers,
-                timeout=10
-            )
+            if company_domain in self._negative_domains:
+                self.observe(f"Clearbit has no data for {company_domain}, skipping lookup")
+                return None
             
-            if response.status_code == 200:
-                data = response.json()
-                
-                enriched = {
-                    'company': lead.get('company'),
-                    'contact': lead.get('contact_name'),
-                    'email': lead.get('email'),
-                    'role': lead.get('title'),
-                    'technologies': data.get('tech', []),
-                    'company_description': data.get('description', ''),
-                    'recent_news': self._fetch_recent_news(lead.get('company'))
-                }
-                
-                self.observe(f"Clearbit enrichment successful for {lead.get('company')}")
-                return enriched
+            cached = _get_cached_company(company_domain)
+            if cached is not None:
+                fetched_at, company = cached
+                if time.monotonic() - fetched_at > CLEARBIT_CACHE_TTL / 2 and company_domain not in _refreshing:
+                    refresh = asyncio.create_task(self._fetch_company(headers, semaphore, company_domain))
+                    _refreshing[company_domain] = refresh
+                    refresh.add_done_callback(lambda task: _refresh_done(company_domain, task))
+                self.observe(f"Clearbit cache hit for {company_domain}")
             else:
-                return None
+                if company_domain not in pending:
+                    pending[company_domain] = asyncio.create_task(
+                        self._fetch_company(headers, semaphore, company_domain)
+                    )
+                company = await pending[company_domain]
+                if company is None:
+                    return None
+            
+            enriched = {
+                'company': lead.company,
+                'contact': lead.contact,
+                'email': lead.email,
+                'role': lead.role,
+                'technologies': list(company['technologies']),
+                'company_description': company['company_description'],
+                'recent_news': self._fetch_recent_news(lead.company)
+            }
+            
+            self.observe(f"Clearbit enrichment successful for {lead.company}")
+            return enriched
                 
         except Exception as e:
             self.observe(f"Clearbit API error: {str(e)}")
             return None
     
-    def _mock_enrich_lead(self, lead: Dict) -> Dict:
-        """Generate mock enrichment data"""
+    async def _fetch_company(self, headers: Dict[str, str], semaphore: asyncio.Semaphore,
+                             company_domain: str) -> Optional[Dict[str, Any]]:
+        """Fetch company data for a domain from Clearbit and cache it"""
+        # Company enrichment
+        async with semaphore:
+            response = await request_with_retry(
+                'GET',
+                'https://company.clearbit.com/v2/companies/find',
+                params={'domain': company_domain},
+                headers=headers,
+                timeout=CLEARBIT_TIMEOUT
+            )
         
-        # Mock technology stacks by company type
-        tech_stacks = {
-            'default': ['Salesforce', 'HubSpot', 'Slack', 'Google Workspace'],
-            'saas': ['AWS', 'React', 'PostgreSQL', 'Redis', 'Docker'],
-            'enterprise': ['Microsoft Azure', 'SAP', 'Oracle', 'Tableau']
-        }
+        if response.status_code == 404:
+            self._negative_domains.add(company_domain)
+            self._negative_domains_changed = True
+            return None
         
-        # Mock recent news
-        news_templates = [
-            f"{lead.get('company')} announces Q4 growth of 25%",
-            f"{lead.get('company')} expands sales team with 15 new hires",
-            f"{lead.get('company')} raises Series B funding",
-            f"{lead.get('company')} launches new product line",
-            f"{lead.get('company')} opens new office in San Francisco"
-        ]
+        if response.status_code != 200:
+            return None
         
-        import random
+        data = response.json()
+        company = {
+            'technologies': data.get('tech', []),
+            'company_description': data.get('description', '')
+        }
+        _store_cached_company(company_domain, company)
+        return company
+    
+    def _mock_enrich_lead(self, lead: Lead) -> Dict:
+        """Generate mock enrichment data"""
+        company = lead.company
         
         enriched = {
-            'company': lead.get('company'),
-            'contact': lead.get('contact_name'),
-            'email': lead.get('email'),
-            'role': lead.get('title'),
-            'technologies': tech_stacks['saas'] if 'VP' in lead.get('title', '') else tech_stacks['default'],
-            'company_description': f"{lead.get('company')} is a leading technology company specializing in enterprise software solutions. They serve mid-market and enterprise customers across North America.",
-            'recent_news': random.choice(news_templates)
+            'company': company,
+            'contact': lead.contact,
+            'email': lead.email,
+            'role': lead.role,
+            'technologies': list(_TECH_STACKS['saas'] if 'VP' in lead.role else _TECH_STACKS['default']),
+            'company_description': f"{company} is a leading technology company specializing in enterprise software solutions. They serve mid-market and enterprise customers across North America.",
+            'recent_news': self._rng.choice(_MOCK_NEWS_TEMPLATES).format(company=company)
         }
         
         return enriched
     
     def _fetch_recent_news(self, company_name: str) -> str:
         """Fetch recent news about company (mock implementation)"""
-        news_items = [
-            f"{company_name} reports strong quarterly earnings",
-            f"{company_name} expands into new markets",
-            f"{company_name} announces strategic partnership",
-            f"{company_name} releases innovative product update"
-        ]
-        
-        import random
-        return random.choice(news_items)
\ No newline at end of file
+        return self._rng.choice(_NEWS_TEMPLATES).format(company=company_name)
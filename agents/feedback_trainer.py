@@ -1,7 +1,84 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable, Tuple
+from concurrent.futures import Future
 from datetime import datetime
-import json
+from functools import lru_cache
+import gzip
+import os
+import orjson
 from . import BaseAgent
+from .types import count_engagement, score_column
+
+
+# Recommendation rules, checked in order: (predicate over campaign stats, template).
+# 'current_value' in each template is a format string filled from the same stats.
+RECOMMENDATION_RULES: List[Tuple[Callable[[Dict[str, Any]], bool], Dict[str, str]]] = [
+    # Analyze open rate
+    (lambda m: m['open_rate'] < 20, {
+        'category': 'Subject Lines',
+        'suggestion': 'Open rate is below industry average (20%). Consider testing more personalized subject lines that reference company-specific news or pain points.',
+        'confidence': 'high',
+        'current_value': '{open_rate:.1f}%',
+        'target_value': '25-30%'
+    }),
+    # Analyze reply rate
+    (lambda m: m['reply_rate'] < 2, {
+        'category': 'Email Content',
+        'suggestion': 'Reply rate is low. Try shorter emails (under 100 words), clearer value propositions, and more specific CTAs.',
+        'confidence': 'high',
+        'current_value': '{reply_rate:.1f}%',
+        'target_value': '3-5%'
+    }),
+    # Analyze meeting booking rate
+    (lambda m: m['meeting_rate'] < 0.5 and m['reply_rate'] > 2, {
+        'category': 'Call-to-Action',
+        'suggestion': 'Good reply rate but low meeting bookings. Make CTAs more specific (e.g., "15-min call Tuesday 2pm?") and include calendar links.',
+        'confidence': 'medium',
+        'current_value': '{meeting_rate:.1f}%',
+        'target_value': '1-2%'
+    }),
+    # Analyze lead scoring effectiveness
+    (lambda m: m['avg_score'] < 70, {
+        'category': 'ICP Targeting',
+        'suggestion': 'Average lead score is below 70. Consider tightening ICP criteria to focus on higher-quality prospects.',
+        'confidence': 'medium',
+        'current_value': '{avg_score:.1f}',
+        'target_value': '75+'
+    }),
+    # Positive feedback
+    (lambda m: m['open_rate'] > 25, {
+        'category': 'Subject Lines',
+        'suggestion': 'Subject lines are performing well! Document winning patterns and continue A/B testing.',
+        'confidence': 'high',
+        'current_value': '{open_rate:.1f}%',
+        'target_value': 'Maintain'
+    }),
+    (lambda m: m['meeting_rate'] > 1, {
+        'category': 'Overall Performance',
+        'suggestion': 'Excellent meeting booking rate! Scale this campaign and document the messaging approach.',
+        'confidence': 'high',
+        'current_value': '{meeting_rate:.1f}%',
+        'target_value': 'Scale'
+    }),
+]
+
+
+@lru_cache(maxsize=1)
+def _ensure_data_dir():
+    """Create the data/ directory once per process"""
+    os.makedirs('data', exist_ok=True)
+
+
+def _write_feedback_file(filename: str, feedback_data: Dict[str, Any]):
+    """Write feedback data as gzipped JSON (runs on the background writer)"""
+    with gzip.open(filename, 'wb', compresslevel=3) as f:
+        f.write(orjson.dumps(feedback_data, option=orjson.OPT_INDENT_2))
+
+
+def _materialize_recommendation(template: Dict[str, str], stats: Dict[str, Any]) -> Dict[str, str]:
+    """Build a recommendation from a rule template, filling in the current value"""
+    recommendation = dict(template)
+    recommendation['current_value'] = template['current_value'].format_map(stats)
+    return recommendation
 
 
 class FeedbackTrainerAgent(BaseAgent):
@@ -28,8 +105,11 @@ class FeedbackTrainerAgent(BaseAgent):
         
         self.think(f"Analyzing {len(responses)} campaign responses")
         
+        # One timestamp for the whole analysis, shared by the metrics and the saved file
+        now = datetime.now()
+        
         # Calculate metrics
-        metrics = self._calculate_metrics(responses)
+        metrics = self._calculate_metrics(responses, now.isoformat())
         
         self.observe(f"Metrics calculated: Open rate: {metrics['open_rate']:.1f}%, "
                     f"Reply rate: {metrics['reply_rate']:.1f}%")
@@ -40,7 +120,7 @@ class FeedbackTrainerAgent(BaseAgent):
         self.observe(f"Generated {len(recommendations)} recommendations")
         
         # Save to Google Sheets
-        self._save_to_sheets(metrics, recommendations)
+        self._save_to_sheets(metrics, recommendations, now)
         
         output = {
             'metrics': metrics,
@@ -51,12 +131,13 @@ class FeedbackTrainerAgent(BaseAgent):
         
         return output
     
-    def _calculate_metrics(self, responses: List[Dict]) -> Dict[str, float]:
+    def _calculate_metrics(self, responses: List[Dict], timestamp: str) -> Dict[str, float]:
         """
         Calculate campaign performance metrics
         
         Args:
             responses: List of email engagement data
+            timestamp: ISO timestamp recorded with the metrics
             
         Returns:
             Dictionary with calculated metrics
@@ -71,10 +152,11 @@ class FeedbackTrainerAgent(BaseAgent):
                 'meeting_rate': 0
             }
         
-        opened = sum(1 for r in responses if r.get('opened', False))
-        clicked = sum(1 for r in responses if r.get('clicked', False))
-        replied = sum(1 for r in responses if r.get('replied', False))
-        meetings = sum(1 for r in responses if r.get('meeting_booked', False))
+        counts = count_engagement(responses)
+        opened = counts['opened']
+        clicked = counts['clicked']
+        replied = counts['replied']
+        meetings = counts['meeting_booked']
         
         metrics = {
             'total_sent': total,
@@ -86,7 +168,7 @@ class FeedbackTrainerAgent(BaseAgent):
             'click_rate': (clicked / total * 100) if total > 0 else 0,
             'reply_rate': (replied / total * 100) if total > 0 else 0,
             'meeting_rate': (meetings / total * 100) if total > 0 else 0,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': timestamp
         }
         
         return metrics
@@ -104,81 +186,29 @@ class FeedbackTrainerAgent(BaseAgent):
         Returns:
             List of recommendation dictionaries
         """
-        recommendations = []
+        # Rules are evaluated against the campaign metrics plus the average lead score
+        stats = dict(metrics)
+        stats['avg_score'] = float(score_column(scored_leads).mean()) if scored_leads else 0
         
-        # Analyze open rate
-        if metrics['open_rate'] < 20:
-            recommendations.append({
-                'category': 'Subject Lines',
-                'suggestion': 'Open rate is below industry average (20%). Consider testing more personalized subject lines that reference company-specific news or pain points.',
-                'confidence': 'high',
-                'current_value': f"{metrics['open_rate']:.1f}%",
-                'target_value': '25-30%'
-            })
-        
-        # Analyze reply rate
-        if metrics['reply_rate'] < 2:
-            recommendations.append({
-                'category': 'Email Content',
-                'suggestion': 'Reply rate is low. Try shorter emails (under 100 words), clearer value propositions, and more specific CTAs.',
-                'confidence': 'high',
-                'current_value': f"{metrics['reply_rate']:.1f}%",
-                'target_value': '3-5%'
-            })
-        
-        # Analyze meeting booking rate
-        if metrics['meeting_rate'] < 0.5 and metrics['reply_rate'] > 2:
-            recommendations.append({
-                'category': 'Call-to-Action',
-                'suggestion': 'Good reply rate but low meeting bookings. Make CTAs more specific (e.g., "15-min call Tuesday 2pm?") and include calendar links.',
-                'confidence': 'medium',
-                'current_value': f"{metrics['meeting_rate']:.1f}%",
-                'target_value': '1-2%'
-            })
-        
-        # Analyze lead scoring effectiveness
-        avg_score = sum(lead.get('score', 0) for lead in scored_leads) / len(scored_leads) if scored_leads else 0
-        if avg_score < 70:
-            recommendations.append({
-                'category': 'ICP Targeting',
-                'suggestion': 'Average lead score is below 70. Consider tightening ICP criteria to focus on higher-quality prospects.',
-                'confidence': 'medium',
-                'current_value': f"{avg_score:.1f}",
-                'target_value': '75+'
-            })
-        
-        # Positive feedback
-        if metrics['open_rate'] > 25:
-            recommendations.append({
-                'category': 'Subject Lines',
-                'suggestion': 'Subject lines are performing well! Document winning patterns and continue A/B testing.',
-                'confidence': 'high',
-                'current_value': f"{metrics['open_rate']:.1f}%",
-                'target_value': 'Maintain'
-            })
-        
-        if metrics['meeting_rate'] > 1:
-            recommendations.append({
-                'category': 'Overall Performance',
-                'suggestion': 'Excellent meeting booking rate! Scale this campaign and document the messaging approach.',
-                'confidence': 'high',
-                'current_value': f"{metrics['meeting_rate']:.1f}%",
-                'target_value': 'Scale'
-            })
+        recommendations = []
+        for predicate, template in RECOMMENDATION_RULES:
+            if predicate(stats):
+                recommendations.append(_materialize_recommendation(template, stats))
         
         return recommendations
     
-    def _save_to_sheets(self, metrics: Dict, recommendations: List[Dict]):
+    def _save_to_sheets(self, metrics: Dict, recommendations: List[Dict], now: datetime):
         """
         Save metrics and recommendations to Google Sheets
         
         Args:
             metrics: Performance metrics
             recommendations: Generated recommendations
+            now: Time of the analysis, used to name the local file
         """
         if 'GoogleSheets' not in self.tools_config:
             self.observe("Google Sheets not configured, saving to local file")
-            self._save_to_local_file(metrics, recommendations)
+            self._save_to_local_file(metrics, recommendations, now)
             return
         
         try:
@@ -193,30 +223,32 @@ class FeedbackTrainerAgent(BaseAgent):
             
             self.act("Saving to Google Sheets")
             self.observe("⚠️  Google Sheets integration not fully configured, saving locally")
-            self._save_to_local_file(metrics, recommendations)
+            self._save_to_local_file(metrics, recommendations, now)
             
         except Exception as e:
             self.observe(f"Google Sheets error: {str(e)}")
-            self._save_to_local_file(metrics, recommendations)
+            self._save_to_local_file(metrics, recommendations, now)
     
-    def _save_to_local_file(self, metrics: Dict, recommendations: List[Dict]):
-        """Save feedback to local JSON file"""
-        import os
+    def _save_to_local_file(self, metrics: Dict, recommendations: List[Dict], now: datetime) -> Future:
+        """
+        Save feedback to a local gzipped JSON file
         
-        os.makedirs('data', exist_ok=True)
+        The write happens on the background writer thread; the returned
+        Future completes once the file is on disk.
+        """
+        _ensure_data_dir()
         
         feedback_data = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': now.isoformat(),
             'metrics': metrics,
             'recommendations': recommendations
         }
         
-        filename = f"data/feedback_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        filename = f"data/feedback_{now.strftime('%Y%m%d_%H%M%S')}.json.gz"
         
-        with open(filename, 'w') as f:
-            json.dump(feedback_data, f, indent=2)
+        future = self.write_in_background(_write_feedback_file, filename, feedback_data)
         
-        self.observe(f"[+] Feedback saved to {filename}")
+        self.observe(f"[+] Feedback queued for saving to {filename}")
         
         # Also print recommendations to console
         print("\n" + "="*60)
@@ -227,4 +259,6 @@ class FeedbackTrainerAgent(BaseAgent):
             print(f"  {rec['suggestion']}")
             print(f"  Current: {rec['current_value']} -> Target: {rec['target_value']}")
             print(f"  Confidence: {rec['confidence']}")
-        print("="*60 + "\n")
\ No newline at end of file
+        print("="*60 + "\n")
+        
+        return future
\ No newline at end of file
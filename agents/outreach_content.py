@@ -1,52 +1,118 @@
-from typing import Dict, Any, List
-from openai import OpenAI
-import os
-from . import BaseAgent
+from typing import Dict, Any, List, Optional, AsyncIterator
+import random
+from openai import AsyncOpenAI
+from . import StreamingAgent, map_concurrent, get_http_client
+from .types import Lead
 
 
-class OutreachContentAgent(BaseAgent):
+# Prompt for OpenAI email generation, filled per lead with str.format_map
+OUTREACH_PROMPT_TEMPLATE = """You are a {persona} writing a personalized outreach email.
+
+Lead Information:
+- Name: {contact}
+- Role: {role}
+- Company: {company}
+- Company Description: {company_description}
+- Recent News: {recent_news}
+- Technologies: {technologies}
+- Lead Score: {score}/100
+
+Task:
+Write a {tone} outreach email to this prospect. The email should:
+1. Be personalized based on their company and recent news
+2. Be concise (under 150 words)
+3. Have a clear value proposition
+4. Include a specific call-to-action (schedule a 15-min call)
+5. Sound natural and human, not salesy
+
+Product: Analytos.ai - AI-powered sales analytics and lead generation platform
+
+Return ONLY two things:
+SUBJECT: [subject line here]
+BODY: [email body here]
+"""
+
+# Subject templates are formatted only after one has been picked
+_SUBJECT_TEMPLATES = (
+    "Quick question about {company}'s sales process",
+    "Helping {company} scale lead generation",
+    "{first_name}, thoughts on AI-powered sales?",
+    "Scaling sales at {company}",
+    "Re: {company}'s recent growth"
+)
+
+
+class OutreachContentAgent(StreamingAgent):
     """
     Agent responsible for generating personalized outreach content
     Uses OpenAI GPT-4o-mini to create compelling emails
     """
     
+    def __init__(self, step_config: Dict[str, Any], tools_config: Dict[str, Any]):
+        super().__init__(step_config, tools_config)
+        
+        self._rng = random.Random()
+        
+        # Created once with the agent (None without an API key) so that every
+        # lead, and every per-run copy (see BaseAgent.for_run), shares one
+        # client; it rides on the shared connection pool rather than opening
+        # a separate one
+        api_key = self.tools_config.get('OpenAI', {}).get('api_key')
+        self._openai_client: Optional[AsyncOpenAI] = (
+            AsyncOpenAI(api_key=api_key, http_client=get_http_client()) if api_key else None
+        )
+    
+    stream_input = 'ranked_leads'
+    stream_output = 'messages'
+    stream_record_type = Lead
+    
     def execute(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
         """
         Generate personalized outreach messages for each lead
         
         Args:
-            inputs: Contains 'ranked_leads', 'persona', and 'tone'
+            inputs: Contains 'ranked_leads' (Lead records), 'persona', and 'tone'
             
         Returns:
             Dictionary with 'messages' array containing email content
         """
+        return self.execute_stream(inputs)
+    
+    async def astream(self, ranked_leads: AsyncIterator[Lead],
+                      inputs: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Generate emails as leads arrive, bounded by the OpenAI max_concurrency setting"""
         self.think("Starting outreach content generation")
         
-        ranked_leads = inputs.get('ranked_leads', [])
         persona = inputs.get('persona', 'SDR')
         tone = inputs.get('tone', 'friendly and professional')
         
-        self.think(f"Generating personalized emails for {len(ranked_leads)} leads")
         self.think(f"Persona: {persona}, Tone: {tone}")
         
-        messages = []
+        max_concurrency = self.tools_config.get('OpenAI', {}).get('max_concurrency', 8)
         
-        for lead in ranked_leads:
-            self.act(f"Generating email for {lead.get('contact')} at {lead.get('company')}")
-            
-            email_content = self._generate_email(lead, persona, tone)
+        async def generate_message(lead: Lead) -> Dict[str, Any]:
+            self.act(f"Generating email for {lead.contact} at {lead.company}")
+            email_content = await self._generate_email(lead, persona, tone)
             
-            message = {
-                'lead': lead.get('contact'),
-                'email': lead.get('email'),
+            self.observe(f"Generated email for {lead.contact}")
+            return {
+                'lead': lead.contact,
+                'email': lead.email,
                 'subject': email_content['subject'],
                 'email_body': email_content['body'],
-                'company': lead.get('company')
+                'company': lead.company
             }
-            
-            messages.append(message)
-            self.observe(f"Generated email for {lead.get('contact')}")
         
+        messages = map_concurrent(ranked_leads, generate_message, max_concurrency)
+        try:
+            async for message in messages:
+                yield message
+        finally:
+            # Closing the stream early cancels the generations still in flight
+            await messages.aclose()
+    
+    def collect(self, messages: List[Dict[str, Any]], inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Save the generated emails and build the step output"""
         self.observe(f"Successfully generated {len(messages)} personalized emails")
         
         # Save emails to file for review
@@ -57,7 +123,7 @@ class OutreachContentAgent(BaseAgent):
         
         return output
     
-    def _generate_email(self, lead: Dict, persona: str, tone: str) -> Dict[str, str]:
+    async def _generate_email(self, lead: Lead, persona: str, tone: str) -> Dict[str, str]:
         """
         Generate email using OpenAI or fallback to template
         
@@ -71,7 +137,7 @@ class OutreachContentAgent(BaseAgent):
         """
         # Try OpenAI first
         if 'OpenAI' in self.tools_config:
-            openai_result = self._generate_with_openai(lead, persona, tone)
+            openai_result = await self._generate_with_openai(lead, persona, tone)
             if openai_result:
                 return openai_result
         
@@ -79,45 +145,28 @@ class OutreachContentAgent(BaseAgent):
         self.observe("Using template-based email generation")
         return self._generate_template_email(lead, persona)
     
-    def _generate_with_openai(self, lead: Dict, persona: str, tone: str) -> Dict[str, str]:
+    async def _generate_with_openai(self, lead: Lead, persona: str, tone: str) -> Optional[Dict[str, str]]:
         """Generate email using OpenAI API"""
         api_config = self.tools_config.get('OpenAI', {})
-        api_key = api_config.get('api_key')
         
-        if not api_key or api_key == '':
+        client = self._openai_client
+        if client is None:
             return None
         
         try:
-            client = OpenAI(api_key=api_key)
+            prompt = OUTREACH_PROMPT_TEMPLATE.format_map({
+                'persona': persona,
+                'tone': tone,
+                'contact': lead.contact,
+                'role': lead.role,
+                'company': lead.company,
+                'company_description': lead.company_description or 'N/A',
+                'recent_news': lead.recent_news or 'N/A',
+                'technologies': ', '.join(lead.technologies),
+                'score': lead.score
+            })
             
-            # Create prompt
-            prompt = f"""You are a {persona} writing a personalized outreach email.
-
-Lead Information:
-- Name: {lead.get('contact')}
-- Role: {lead.get('role')}
-- Company: {lead.get('company')}
-- Company Description: {lead.get('company_description', 'N/A')}
-- Recent News: {lead.get('recent_news', 'N/A')}
-- Technologies: {', '.join(lead.get('technologies', []))}
-- Lead Score: {lead.get('score')}/100
-
-Task:
-Write a {tone} outreach email to this prospect. The email should:
-1. Be personalized based on their company and recent news
-2. Be concise (under 150 words)
-3. Have a clear value proposition
-4. Include a specific call-to-action (schedule a 15-min call)
-5. Sound natural and human, not salesy
-
-Product: Analytos.ai - AI-powered sales analytics and lead generation platform
-
-Return ONLY two things:
-SUBJECT: [subject line here]
-BODY: [email body here]
-"""
-            
-            response = client.chat.completions.create(
+            response = await client.chat.completions.create(
                 model=api_config.get('model', 'gpt-4o-mini'),
                 messages=[
                     {"role": "system", "content": "You are an expert sales copywriter who writes compelling, personalized outreach emails."},
@@ -129,17 +178,11 @@ BODY: [email body here]
             
             content = response.choices[0].message.content.strip()
             
-            # Parse response
-            lines = content.split('\n')
-            subject = ''
-            body = ''
-            
-            for i, line in enumerate(lines):
-                if line.startswith('SUBJECT:'):
-                    subject = line.replace('SUBJECT:', '').strip()
-                elif line.startswith('BODY:'):
-                    body = '\n'.join(lines[i+1:]).strip()
-                    break
+            # Parse response: everything after the BODY: marker is the body,
+            # and the subject is the rest of the SUBJECT: line before it
+            head, _, body = content.partition('\nBODY:')
+            subject = head.partition('SUBJECT:')[2].partition('\n')[0].strip()
+            body = body.strip()
             
             if not body:
                 body = content
@@ -153,20 +196,23 @@ BODY: [email body here]
             self.observe(f"OpenAI API error: {str(e)}")
             return None
     
-    def _generate_template_email(self, lead: Dict, persona: str) -> Dict[str, str]:
+    def _generate_template_email(self, lead: Lead, persona: str) -> Dict[str, str]:
         """Generate email using template"""
         
         subject = self._generate_subject(lead)
         
-        body = f"""Hi {lead.get('contact').split()[0]},
+        company = lead.company
+        recent_news = (lead.recent_news or 'has been growing').lower()
+        
+        body = f"""Hi {lead.first_name},
 
-I noticed {lead.get('company')} recently {lead.get('recent_news', 'has been growing').lower()}.
+I noticed {company} recently {recent_news}.
 
-At Analytos.ai, we help B2B companies like {lead.get('company')} streamline their lead generation process using AI-powered analytics. Our platform has helped similar companies increase qualified leads by 40% while reducing manual research time by 60%.
+At Analytos.ai, we help B2B companies like {company} streamline their lead generation process using AI-powered analytics. Our platform has helped similar companies increase qualified leads by 40% while reducing manual research time by 60%.
 
-Given {lead.get('company')}'s growth trajectory and your role as {lead.get('role')}, I thought this might be relevant for your team.
+Given {company}'s growth trajectory and your role as {lead.role}, I thought this might be relevant for your team.
 
-Would you be open to a quick 15-minute call next week to explore how we could help {lead.get('company')} scale your sales efforts more efficiently?
+Would you be open to a quick 15-minute call next week to explore how we could help {company} scale your sales efforts more efficiently?
 
 Best regards,
 Sales Team
@@ -177,16 +223,7 @@ Analytos.ai"""
             'body': body
         }
     
-    def _generate_subject(self, lead: Dict) -> str:
+    def _generate_subject(self, lead: Lead) -> str:
         """Generate email subject line"""
-        
-        subjects = [
-            f"Quick question about {lead.get('company')}'s sales process",
-            f"Helping {lead.get('company')} scale lead generation",
-            f"{lead.get('contact').split()[0]}, thoughts on AI-powered sales?",
-            f"Scaling sales at {lead.get('company')}",
-            f"Re: {lead.get('company')}'s recent growth"
-        ]
-        
-        import random
-        return random.choice(subjects)
\ No newline at end of file
+        template = self._rng.choice(_SUBJECT_TEMPLATES)
+        return template.format(company=lead.company, first_name=lead.first_name)
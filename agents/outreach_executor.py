@@ -1,17 +1,35 @@
 from typing import Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 import uuid
 from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
+from sendgrid.helpers.mail import Mail, From, To, Personalization, PlainTextContent, Substitution
 from . import BaseAgent
 
 
+# Number of SendGrid requests allowed in flight at once
+SENDGRID_MAX_WORKERS = 16
+
+# SendGrid accepts up to 1000 personalizations (recipients) per request
+SENDGRID_MAX_PERSONALIZATIONS = 1000
+
+# Placeholder in the shared body that each personalization substitutes
+BODY_SUBSTITUTION_KEY = '-email_body-'
+
+
 class OutreachExecutorAgent(BaseAgent):
     """
     Agent responsible for executing email outreach
     Uses SendGrid API (or simulates in dry-run mode)
     """
     
+    def __init__(self, step_config: Dict[str, Any], tools_config: Dict[str, Any]):
+        super().__init__(step_config, tools_config)
+        
+        # One client for the whole campaign so urllib3 keeps its connection pool warm
+        api_key = self.tools_config.get('SendGrid', {}).get('api_key')
+        self._sendgrid_client = SendGridAPIClient(api_key) if api_key else None
+    
     def execute(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
         """
         Send outreach emails to leads
@@ -32,20 +50,32 @@ class OutreachExecutorAgent(BaseAgent):
         if dry_run:
             self.observe("[WARNING] DRY RUN MODE - No emails will actually be sent")
         
-        campaign_id = f"campaign_{uuid.uuid4().hex[:8]}_{datetime.now().strftime('%Y%m%d')}"
+        # One clock read per campaign; every record shares the campaign timestamp
+        now = datetime.now()
+        timestamp = now.isoformat()
+        campaign_id = f"campaign_{uuid.uuid4().hex[:8]}_{now.strftime('%Y%m%d')}"
         
-        sent_status = []
+        sent_status = [None] * len(messages)
         
         for message in messages:
             self.act(f"Processing email to {message.get('lead')} at {message.get('email')}")
-            
-            if dry_run:
-                status = self._simulate_send(message)
-            else:
-                status = self._send_with_sendgrid(message)
-            
-            sent_status.append(status)
-            self.observe(f"Email to {message.get('lead')}: {status['status']}")
+        
+        if dry_run:
+            sent_status = [self._simulate_send(message, timestamp) for message in messages]
+        else:
+            # Each batch is a single SendGrid request; batches are sent concurrently
+            with ThreadPoolExecutor(max_workers=SENDGRID_MAX_WORKERS) as executor:
+                futures = {
+                    executor.submit(self._send_batch_with_sendgrid, messages[i:i + SENDGRID_MAX_PERSONALIZATIONS], timestamp): i
+                    for i in range(0, len(messages), SENDGRID_MAX_PERSONALIZATIONS)
+                }
+                for future in as_completed(futures):
+                    start = futures[future]
+                    batch_status = future.result()
+                    sent_status[start:start + len(batch_status)] = batch_status
+        
+        for status in sent_status:
+            self.observe(f"Email to {status.get('lead')}: {status['status']}")
         
         success_count = sum(1 for s in sent_status if s['status'] in ['sent', 'simulated'])
         self.observe(f"Campaign complete: {success_count}/{len(messages)} emails processed")
@@ -58,68 +88,70 @@ class OutreachExecutorAgent(BaseAgent):
         self.validate_output(output)
         return output
     
-    def _simulate_send(self, message: Dict) -> Dict[str, Any]:
+    def _simulate_send(self, message: Dict, timestamp: str) -> Dict[str, Any]:
         """Simulate email sending for dry-run mode"""
         return {
             'email': message.get('email'),
             'lead': message.get('lead'),
             'company': message.get('company'),
             'status': 'simulated',
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': timestamp,
             'message_id': f"sim_{uuid.uuid4().hex[:12]}"
         }
     
-    def _send_with_sendgrid(self, message: Dict) -> Dict[str, Any]:
-        """Send email using SendGrid API"""
+    def _send_batch_with_sendgrid(self, messages: List[Dict], timestamp: str) -> List[Dict[str, Any]]:
+        """Send a batch of emails as one SendGrid request, one personalization per recipient"""
         if 'SendGrid' not in self.tools_config:
-            return {
-                'email': message.get('email'),
-                'lead': message.get('lead'),
-                'status': 'failed',
-                'error': 'SendGrid not configured',
-                'timestamp': datetime.now().isoformat()
-            }
+            return [self._failed_status(message, 'SendGrid not configured', timestamp) for message in messages]
         
         config = self.tools_config['SendGrid']
-        api_key = config.get('api_key')
         from_email = config.get('from_email')
         from_name = config.get('from_name')
         
-        if not api_key or api_key == '':
-            return {
-                'email': message.get('email'),
-                'lead': message.get('lead'),
-                'status': 'failed',
-                'error': 'SendGrid API key not set',
-                'timestamp': datetime.now().isoformat()
-            }
+        if self._sendgrid_client is None:
+            return [self._failed_status(message, 'SendGrid API key not set', timestamp) for message in messages]
         
         try:
+            # Subject and body vary per lead, so they travel in each personalization
             sg_message = Mail(
-                from_email=(from_email, from_name),
-                to_emails=message.get('email'),
-                subject=message.get('subject'),
-                plain_text_content=message.get('email_body')
+                from_email=From(from_email, from_name),
+                plain_text_content=PlainTextContent(BODY_SUBSTITUTION_KEY)
             )
             
-            sg = SendGridAPIClient(api_key)
-            response = sg.send(sg_message)
+            for message in messages:
+                personalization = Personalization()
+                personalization.add_to(To(message.get('email')))
+                personalization.subject = message.get('subject')
+                personalization.add_substitution(Substitution(BODY_SUBSTITUTION_KEY, message.get('email_body')))
+                sg_message.add_personalization(personalization)
+            
+            response = self._sendgrid_client.send(sg_message)
             
-            return {
-                'email': message.get('email'),
-                'lead': message.get('lead'),
-                'company': message.get('company'),
-                'status': 'sent',
-                'timestamp': datetime.now().isoformat(),
-                'message_id': response.headers.get('X-Message-Id', 'unknown'),
-                'status_code': response.status_code
-            }
+            # SendGrid returns one message id for the whole batch
+            message_id = response.headers.get('X-Message-Id', 'unknown')
+            
+            return [
+                {
+                    'email': message.get('email'),
+                    'lead': message.get('lead'),
+                    'company': message.get('company'),
+                    'status': 'sent',
+                    'timestamp': timestamp,
+                    'message_id': message_id,
+                    'status_code': response.status_code
+                }
+                for message in messages
+            ]
             
         except Exception as e:
-            return {
-                'email': message.get('email'),
-                'lead': message.get('lead'),
-                'status': 'failed',
-                'error': str(e),
-                'timestamp': datetime.now().isoformat()
-            }
\ No newline at end of file
+            return [self._failed_status(message, str(e), timestamp) for message in messages]
+    
+    def _failed_status(self, message: Dict, error: str, timestamp: str) -> Dict[str, Any]:
+        """Build the sent_status entry for an email that could not be sent"""
+        return {
+            'email': message.get('email'),
+            'lead': message.get('lead'),
+            'status': 'failed',
+            'error': error,
+            'timestamp': timestamp
+        }
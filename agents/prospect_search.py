@@ -1,7 +1,119 @@
-from typing import Dict, Any, List
-import requests
-import time
-from . import BaseAgent
+from typing import Dict, Any, List, Optional, Tuple, Iterator
+from functools import lru_cache
+from itertools import islice
+import asyncio
+import hashlib
+import diskcache
+import httpx
+import orjson
+from . import BaseAgent, run_async, request_with_retry
+
+
+# Apollo returns people in pages; requests for more leads fan out over several pages
+APOLLO_PAGE_SIZE = 25
+APOLLO_TIMEOUT = 30
+
+# Apollo search results are cached on disk; the prospect list changes slowly
+APOLLO_CACHE_DIR = '.cache/apollo'
+APOLLO_CACHE_TTL = 3600
+
+# Searches issued within this window (or until the batch is full) go out together
+APOLLO_BATCH_INTERVAL_MS = 20
+APOLLO_MAX_BATCH_SIZE = 10
+
+
+class _SearchBatcher:
+    """
+    Coalesces Apollo searches issued close together
+    
+    The first search opens a batch window; everything submitted before it
+    closes (or until the batch is full) is dispatched at once, and identical
+    requests within a batch share one HTTP call. Apollo takes one search per
+    POST, so a batch is sent as concurrent requests. Only touched from the
+    shared agent event loop, so no locking is needed.
+    """
+    
+    def __init__(self, interval_ms: int, max_size: int):
+        self.interval = interval_ms / 1000
+        self.max_size = max_size
+        self._queue: List[Tuple[str, Dict[str, str], Dict[str, Any], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._dispatching = set()
+    
+    async def search(self, endpoint: str, headers: Dict[str, str], payload: Dict[str, Any]) -> httpx.Response:
+        """Queue one search and wait for its response"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.append((endpoint, headers, payload, future))
+        
+        if len(self._queue) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.interval, self._flush)
+        
+        return await future
+    
+    def _flush(self):
+        """Close the current batch and dispatch it"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        
+        batch, self._queue = self._queue, []
+        task = asyncio.ensure_future(self._dispatch(batch))
+        self._dispatching.add(task)
+        task.add_done_callback(self._dispatching.discard)
+    
+    async def _dispatch(self, batch: List[Tuple[str, Dict[str, str], Dict[str, Any], asyncio.Future]]):
+        """Send each distinct request in the batch once and fan the responses out"""
+        unique: Dict[Tuple, Tuple[str, Dict[str, str], bytes, List[asyncio.Future]]] = {}
+        for endpoint, headers, payload, future in batch:
+            # The serialized payload is both the dedupe key and the request body
+            body = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+            key = (endpoint, tuple(sorted(headers.items())), body)
+            unique.setdefault(key, (endpoint, headers, body, []))[3].append(future)
+        
+        responses = await asyncio.gather(*(
+            request_with_retry('POST', endpoint, headers=headers, content=body, timeout=APOLLO_TIMEOUT)
+            for endpoint, headers, body, _ in unique.values()
+        ), return_exceptions=True)
+        
+        for (_, _, _, futures), response in zip(unique.values(), responses):
+            for future in futures:
+                if future.done():
+                    continue
+                if isinstance(response, BaseException):
+                    future.set_exception(response)
+                else:
+                    future.set_result(response)
+
+
+@lru_cache(maxsize=1)
+def _get_apollo_cache() -> diskcache.Cache:
+    """Open the on-disk Apollo cache once per process"""
+    return diskcache.Cache(APOLLO_CACHE_DIR)
+
+
+def _load_cached_leads(cache_key: str) -> Optional[List[Dict[str, Any]]]:
+    """Read cached leads (blocking SQLite and file I/O; run off the event loop)"""
+    return _get_apollo_cache().get(cache_key)
+
+
+def _store_cached_leads(cache_key: str, leads: List[Dict[str, Any]]):
+    """Cache the leads of one search (runs on the background writer)"""
+    _get_apollo_cache().set(cache_key, leads, expire=APOLLO_CACHE_TTL)
+
+
+# One batcher per (interval, size) setting, shared by every search in the process
+_batchers: Dict[Tuple[int, int], _SearchBatcher] = {}
+
+
+def _get_batcher(interval_ms: int, max_size: int) -> _SearchBatcher:
+    """Return the shared batcher for these settings, creating it on first use"""
+    key = (interval_ms, max_size)
+    if key not in _batchers:
+        _batchers[key] = _SearchBatcher(interval_ms, max_size)
+    return _batchers[key]
 
 
 class ProspectSearchAgent(BaseAgent):
@@ -15,7 +127,7 @@ class ProspectSearchAgent(BaseAgent):
         Search for prospects matching ICP criteria
         
         Args:
-            inputs: Contains ICP criteria and search parameters
+            inputs: Contains ICP criteria (one dict or a list of them) and search parameters
             
         Returns:
             Dictionary with 'leads' array
@@ -23,19 +135,21 @@ class ProspectSearchAgent(BaseAgent):
         self.think("Starting prospect search based on ICP criteria")
         
         icp = inputs.get('icp', {})
+        icps = icp if isinstance(icp, list) else [icp]
         signals = inputs.get('signals', [])
         limit = inputs.get('limit', 10)
         
-        self.think(f"ICP: {icp.get('industry')} companies in {icp.get('location')} "
-                  f"with {icp['employee_count']['min']}-{icp['employee_count']['max']} employees")
+        for icp in icps:
+            self.think(f"ICP: {icp.get('industry')} companies in {icp.get('location')} "
+                      f"with {icp['employee_count']['min']}-{icp['employee_count']['max']} employees")
         
         # Try Apollo API first
-        leads = self._search_apollo_api(icp, signals, limit)
+        leads = run_async(self._search_apollo_api(icps, signals, limit))
         
         # If API fails, use mock data
         if not leads:
             self.observe("Apollo API unavailable, using mock data for demonstration")
-            leads = self._generate_mock_leads(icp, limit)
+            leads = self._generate_mock_leads(icps[0], limit)
         
         self.observe(f"Found {len(leads)} qualified leads")
         
@@ -44,8 +158,14 @@ class ProspectSearchAgent(BaseAgent):
         
         return output
     
-    def _search_apollo_api(self, icp: Dict, signals: List[str], limit: int) -> List[Dict]:
-        """Search using Apollo API"""
+    async def _search_apollo_api(self, icps: List[Dict], signals: List[str], limit: int) -> List[Dict]:
+        """
+        Search using Apollo API for every ICP at once
+        
+        Each ICP needs enough pages to cover `limit`; all pages for all ICPs
+        go through the shared batcher. Results are merged in ICP order, and a
+        person matched by several ICPs is kept once.
+        """
         if 'ApolloAPI' not in self.tools_config:
             return []
         
@@ -64,52 +184,88 @@ class ProspectSearchAgent(BaseAgent):
                 'Cache-Control': 'no-cache',
                 'X-Api-Key': api_key
             }
+            endpoint = api_config.get('endpoint', 'https://api.apollo.io/v1/mixed_people/search')
             
-            payload = {
-                "person_titles": ["VP", "Director", "Head", "Chief", "Manager"],
-                "person_seniorities": ["vp", "director", "head"],
-                "organization_locations": [icp.get('location', 'USA')],
-                "organization_num_employees_ranges": [
-                    f"{icp['employee_count']['min']},{icp['employee_count']['max']}"
-                ],
-                "page": 1,
-                "per_page": min(limit, 25)
-            }
+            cache_key = hashlib.blake2b(orjson.dumps(
+                {'endpoint': endpoint, 'icps': icps, 'signals': signals, 'limit': limit},
+                option=orjson.OPT_SORT_KEYS
+            )).hexdigest()
+            
+            if self.use_cache:
+                # diskcache blocks, so keep it off the loop other requests are using
+                cached = await asyncio.to_thread(_load_cached_leads, cache_key)
+                if cached is not None:
+                    self.observe(f"Apollo cache hit: {len(cached)} leads")
+                    return cached
             
-            response = requests.post(
-                api_config.get('endpoint', 'https://api.apollo.io/v1/mixed_people/search'),
-                headers=headers,
-                json=payload,
-                timeout=30
+            per_page = max(1, min(limit, APOLLO_PAGE_SIZE))
+            page_count = -(-limit // per_page)
+            
+            batcher = _get_batcher(
+                api_config.get('batch_interval_ms', APOLLO_BATCH_INTERVAL_MS),
+                api_config.get('max_batch_size', APOLLO_MAX_BATCH_SIZE)
             )
+            responses = await asyncio.gather(*(
+                batcher.search(endpoint, headers, self._build_search_payload(icp, page, per_page))
+                for icp in icps
+                for page in range(1, page_count + 1)
+            ))
             
-            if response.status_code == 200:
-                data = response.json()
-                people = data.get('people', [])
-                
-                leads = []
-                for person in people[:limit]:
-                    lead = {
-                        'company': person.get('organization', {}).get('name', 'Unknown'),
-                        'contact_name': person.get('name', 'Unknown'),
-                        'email': person.get('email', ''),
-                        'title': person.get('title', ''),
-                        'linkedin': person.get('linkedin_url', ''),
-                        'company_size': person.get('organization', {}).get('estimated_num_employees', 0),
-                        'signal': signals[0] if signals else 'general_outreach'
-                    }
-                    leads.append(lead)
-                
-                self.observe(f"Apollo API returned {len(leads)} leads")
-                return leads
-            else:
-                self.observe(f"Apollo API error: {response.status_code}")
-                return []
+            signal = signals[0] if signals else 'general_outreach'
+            
+            # Later pages are only decoded if the earlier ones fell short of the limit
+            leads = [
+                {
+                    'company': person.get('organization', {}).get('name', 'Unknown'),
+                    'contact_name': person.get('name', 'Unknown'),
+                    'email': person.get('email', ''),
+                    'title': person.get('title', ''),
+                    'linkedin': person.get('linkedin_url', ''),
+                    'company_size': person.get('organization', {}).get('estimated_num_employees', 0),
+                    'signal': signal
+                }
+                for person in islice(self._unique_people(responses), limit)
+            ]
+            
+            self.observe(f"Apollo API returned {len(leads)} leads")
+            
+            if leads and self.use_cache:
+                self.write_in_background(_store_cached_leads, cache_key, leads)
+            
+            return leads
                 
         except Exception as e:
             self.observe(f"Apollo API exception: {str(e)}")
             return []
     
+    def _unique_people(self, responses: List[httpx.Response]) -> Iterator[Dict[str, Any]]:
+        """Yield people from the search responses in order, once per Apollo id"""
+        seen = set()
+        for response in responses:
+            if response.status_code != 200:
+                self.observe(f"Apollo API error: {response.status_code}")
+                continue
+            for person in orjson.loads(response.content).get('people', []):
+                person_id = person.get('id')
+                if person_id is None:
+                    yield person
+                elif person_id not in seen:
+                    seen.add(person_id)
+                    yield person
+    
+    def _build_search_payload(self, icp: Dict, page: int, per_page: int) -> Dict[str, Any]:
+        """Build the Apollo people-search request body for one page"""
+        return {
+            "person_titles": ["VP", "Director", "Head", "Chief", "Manager"],
+            "person_seniorities": ["vp", "director", "head"],
+            "organization_locations": [icp.get('location', 'USA')],
+            "organization_num_employees_ranges": [
+                f"{icp['employee_count']['min']},{icp['employee_count']['max']}"
+            ],
+            "page": page,
+            "per_page": per_page
+        }
+    
     def _generate_mock_leads(self, icp: Dict, limit: int) -> List[Dict]:
         """Generate mock leads for demonstration"""
         mock_companies = [
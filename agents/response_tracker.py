@@ -1,9 +1,27 @@
 from typing import Dict, Any, List
-import random
 from datetime import datetime
+import numpy as np
 from . import BaseAgent
 
 
+# One generator for the process; engagement for a campaign is drawn in a single call
+_rng = np.random.default_rng()
+
+# Mock reply pools, indexed in bulk with rng.integers; meetings draw positive replies
+_POSITIVE_REPLIES = np.array([
+    "Thanks for reaching out! I'd be interested in learning more. Do you have time for a call next week?",
+    "This looks interesting. Let's schedule a 15-minute call to discuss further.",
+    "I'm interested. Can you send me some more information and your calendar link?",
+    "This could be relevant for our team. Let's connect next Tuesday if you're available."
+], dtype=object)
+_NEUTRAL_REPLIES = np.array([
+    "Thanks for the email. Can you send me more details about your solution?",
+    "Interesting. We're not looking right now but keep me posted.",
+    "I'll review this with my team and get back to you.",
+    "Not a priority at the moment, but let's revisit in Q2."
+], dtype=object)
+
+
 class ResponseTrackerAgent(BaseAgent):
     """
     Agent responsible for tracking email responses and engagement
@@ -28,49 +46,55 @@ class ResponseTrackerAgent(BaseAgent):
         self.think(f"Tracking responses for campaign: {campaign_id}")
         self.think(f"Monitoring {len(sent_status)} emails")
         
-        responses = []
+        # Simulated events all land at the moment tracking ran
+        now_iso = datetime.now().isoformat()
+        
+        tracked = [status for status in sent_status if status.get('status') in ['sent', 'simulated']]
         
-        for status in sent_status:
-            if status.get('status') in ['sent', 'simulated']:
-                self.act(f"Tracking engagement for {status.get('email')}")
-                
-                # In a real system, this would query SendGrid/Apollo APIs
-                # For this demo, we simulate realistic engagement metrics
-                engagement = self._simulate_engagement(status)
-                responses.append(engagement)
-                
-                self.observe(f"{status.get('email')}: "
-                           f"Opened={engagement['opened']}, "
-                           f"Replied={engagement['replied']}")
+        for status in tracked:
+            self.act(f"Tracking engagement for {status.get('email')}")
+        
+        # In a real system, this would query SendGrid/Apollo APIs
+        # For this demo, we simulate realistic engagement metrics
+        engagement = self._simulate_engagement(len(tracked))
+        responses = self._build_responses(tracked, engagement, now_iso)
+        
+        for response in responses:
+            self.observe(f"{response['email']}: "
+                       f"Opened={response['opened']}, "
+                       f"Replied={response['replied']}")
         
         # Calculate overall metrics
         total = len(responses)
-        opened = sum(1 for r in responses if r['opened'])
-        clicked = sum(1 for r in responses if r['clicked'])
-        replied = sum(1 for r in responses if r['replied'])
-        meetings = sum(1 for r in responses if r['meeting_booked'])
-        
-        self.observe(f"Campaign metrics: "
-                    f"Open rate: {opened/total*100:.1f}%, "
-                    f"Reply rate: {replied/total*100:.1f}%, "
-                    f"Meeting rate: {meetings/total*100:.1f}%")
+        opened = int(engagement['opened'].sum())
+        replied = int(engagement['replied'].sum())
+        meetings = int(engagement['meeting_booked'].sum())
+        
+        if total > 0:
+            self.observe(f"Campaign metrics: "
+                        f"Open rate: {opened/total*100:.1f}%, "
+                        f"Reply rate: {replied/total*100:.1f}%, "
+                        f"Meeting rate: {meetings/total*100:.1f}%")
+        else:
+            self.observe("Campaign metrics: no delivered emails to track")
         
         output = {'responses': responses}
         self.validate_output(output)
         
         return output
     
-    def _simulate_engagement(self, email_status: Dict) -> Dict[str, Any]:
+    def _simulate_engagement(self, count: int) -> Dict[str, np.ndarray]:
         """
-        Simulate realistic email engagement metrics
+        Simulate realistic email engagement metrics for a whole campaign at once
         
         In production, this would call SendGrid/Apollo APIs to get real data
         
         Args:
-            email_status: Email send status
+            count: Number of delivered emails
             
         Returns:
-            Engagement metrics dictionary
+            Boolean arrays keyed by 'opened', 'clicked', 'replied' and
+            'meeting_booked', plus a 'reply_content' array (None where no reply)
         """
         # Realistic engagement rates for B2B cold emails
         # Open rate: ~20-30%
@@ -78,48 +102,59 @@ class ResponseTrackerAgent(BaseAgent):
         # Reply rate: ~1-3%
         # Meeting rate: ~0.5-1%
         
-        opened = random.random() < 0.25  # 25% open rate
-        clicked = opened and random.random() < 0.15  # 15% of opens click
-        replied = opened and random.random() < 0.08  # 8% of opens reply
-        meeting_booked = replied and random.random() < 0.3  # 30% of replies book meeting
+        draws = _rng.random((count, 4))
         
-        engagement = {
-            'email': email_status.get('email'),
-            'lead': email_status.get('lead'),
-            'company': email_status.get('company'),
+        opened = draws[:, 0] < 0.25  # 25% open rate
+        clicked = opened & (draws[:, 1] < 0.15)  # 15% of opens click
+        replied = opened & (draws[:, 2] < 0.08)  # 8% of opens reply
+        meeting_booked = replied & (draws[:, 3] < 0.3)  # 30% of replies book meeting
+        
+        # Draw every reply in one call per pool and scatter them by mask
+        neutral = replied & ~meeting_booked
+        reply_content = np.full(count, None, dtype=object)
+        reply_content[meeting_booked] = _POSITIVE_REPLIES[
+            _rng.integers(len(_POSITIVE_REPLIES), size=int(meeting_booked.sum()))
+        ]
+        reply_content[neutral] = _NEUTRAL_REPLIES[
+            _rng.integers(len(_NEUTRAL_REPLIES), size=int(neutral.sum()))
+        ]
+        
+        return {
             'opened': opened,
             'clicked': clicked,
             'replied': replied,
             'meeting_booked': meeting_booked,
-            'open_timestamp': datetime.now().isoformat() if opened else None,
-            'reply_timestamp': datetime.now().isoformat() if replied else None
+            'reply_content': reply_content
         }
+    
+    def _build_responses(self, tracked: List[Dict], engagement: Dict[str, np.ndarray],
+                         now_iso: str) -> List[Dict[str, Any]]:
+        """Turn the engagement arrays into one response record per email"""
+        # tolist() yields plain Python bools, which the output schema expects
+        columns = zip(*(engagement[key].tolist()
+                        for key in ('opened', 'clicked', 'replied', 'meeting_booked', 'reply_content')))
         
-        # Add reply content for positive responses
-        if replied:
-            engagement['reply_content'] = self._generate_mock_reply(meeting_booked)
+        responses = []
+        for email_status, (opened, clicked, replied, meeting_booked, reply_content) in zip(tracked, columns):
+            response = {
+                'email': email_status.get('email'),
+                'lead': email_status.get('lead'),
+                'company': email_status.get('company'),
+                'opened': opened,
+                'clicked': clicked,
+                'replied': replied,
+                'meeting_booked': meeting_booked,
+                'open_timestamp': now_iso if opened else None,
+                'reply_timestamp': now_iso if replied else None
+            }
+            
+            # Add reply content for positive responses
+            if replied:
+                response['reply_content'] = reply_content
+            
+            responses.append(response)
         
-        return engagement
-    
-    def _generate_mock_reply(self, positive: bool) -> str:
-        """Generate mock reply content"""
-        
-        if positive:
-            positive_replies = [
-                "Thanks for reaching out! I'd be interested in learning more. Do you have time for a call next week?",
-                "This looks interesting. Let's schedule a 15-minute call to discuss further.",
-                "I'm interested. Can you send me some more information and your calendar link?",
-                "This could be relevant for our team. Let's connect next Tuesday if you're available."
-            ]
-            return random.choice(positive_replies)
-        else:
-            neutral_replies = [
-                "Thanks for the email. Can you send me more details about your solution?",
-                "Interesting. We're not looking right now but keep me posted.",
-                "I'll review this with my team and get back to you.",
-                "Not a priority at the moment, but let's revisit in Q2."
-            ]
-            return random.choice(neutral_replies)
+        return responses
     
     def _track_with_apollo_api(self, campaign_id: str) -> List[Dict]:
         """
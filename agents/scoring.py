@@ -1,28 +1,60 @@
-from typing import Dict, Any, List
-from . import BaseAgent
+from typing import Dict, Any, List, Optional, AsyncIterator
+import heapq
+import itertools
+import numpy as np
+from . import StreamingAgent
+from .types import Lead, score_column
 
 
-class ScoringAgent(BaseAgent):
+# High-value technologies that indicate good fit; any other technology earns 5 points
+_VALUABLE_TECH = {
+    'Salesforce': 20,
+    'HubSpot': 20,
+    'AWS': 15,
+    'Azure': 15,
+    'Google Cloud': 15,
+    'Slack': 10,
+    'Zoom': 10,
+    'Docker': 10,
+    'Kubernetes': 10
+}
+
+
+class ScoringAgent(StreamingAgent):
     """
     Agent responsible for scoring and ranking leads based on ICP criteria
     """
     
+    stream_input = 'enriched_leads'
+    stream_output = 'ranked_leads'
+    stream_record_type = Lead
+    
     def execute(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
         """
         Score and rank leads based on ICP match
         
         Args:
-            inputs: Contains 'enriched_leads' and 'scoring_criteria'
+            inputs: Contains 'enriched_leads' (Lead records) and 'scoring_criteria'
             
         Returns:
             Dictionary with 'ranked_leads' array (sorted by score)
         """
+        return self.execute_stream(inputs)
+    
+    async def astream(self, enriched_leads: AsyncIterator[Lead],
+                      inputs: Dict[str, Any]) -> AsyncIterator[Dict]:
+        """
+        Score leads as they arrive and yield those that clear the threshold
+        
+        Ranking needs every score, so the qualifying leads are released
+        highest score first once the input stream ends; downstream steps
+        therefore see them in ranked_leads order.
+        """
         self.think("Starting lead scoring based on ICP criteria")
         
-        enriched_leads = inputs.get('enriched_leads', [])
         scoring_criteria = inputs.get('scoring_criteria', {})
         
-        self.think(f"Scoring {len(enriched_leads)} leads using weighted criteria")
+        self.think("Scoring leads using weighted criteria")
         
         # Get scoring weights
         weights = scoring_criteria.get('weights', {
@@ -35,10 +67,15 @@ class ScoringAgent(BaseAgent):
         # Get minimum score threshold
         min_score = scoring_criteria.get('thresholds', {}).get('min_score', 60)
         
-        ranked_leads = []
+        # With top_k set, only the best k leads are kept (in a bounded min-heap)
+        top_k = self._get_top_k(scoring_criteria)
+        qualified = []
+        heap = []
+        arrival = itertools.count()
         
-        for lead in enriched_leads:
-            self.act(f"Scoring lead: {lead.get('company')}")
+        async for lead in enriched_leads:
+            company = lead.company
+            self.act(f"Scoring lead: {company}")
             
             # Calculate individual scores
             score_breakdown = self._calculate_score_breakdown(lead, weights)
@@ -49,22 +86,41 @@ class ScoringAgent(BaseAgent):
             # Only include leads above threshold
             if total_score >= min_score:
                 ranked_lead = {
-                    'company': lead.get('company'),
-                    'contact': lead.get('contact'),
-                    'email': lead.get('email'),
-                    'role': lead.get('role'),
+                    'company': company,
+                    'contact': lead.contact,
+                    'email': lead.email,
+                    'role': lead.role,
                     'score': round(total_score, 2),
                     'score_breakdown': score_breakdown,
-                    'technologies': lead.get('technologies', []),
-                    'company_description': lead.get('company_description', ''),
-                    'recent_news': lead.get('recent_news', '')
+                    'technologies': lead.technologies,
+                    'company_description': lead.company_description,
+                    'recent_news': lead.recent_news
                 }
-                ranked_leads.append(ranked_lead)
                 
-                self.observe(f"{lead.get('company')} scored {total_score:.2f}")
-        
-        # Sort by score (highest first)
-        ranked_leads.sort(key=lambda x: x['score'], reverse=True)
+                self.observe(f"{company} scored {total_score:.2f}")
+                if top_k is None:
+                    qualified.append(ranked_lead)
+                else:
+                    # On equal scores the later lead is evicted first, as a stable sort would
+                    entry = (ranked_lead['score'], -next(arrival), ranked_lead)
+                    if len(heap) < top_k:
+                        heapq.heappush(heap, entry)
+                    else:
+                        heapq.heappushpop(heap, entry)
+        
+        if top_k is None:
+            # Sort by score (highest first); a stable argsort keeps arrival order for ties
+            order = np.argsort(-score_column(qualified), kind='stable')
+            ranked = [qualified[i] for i in order.tolist()]
+        else:
+            ranked = [ranked_lead for _, _, ranked_lead in sorted(heap, reverse=True)]
+        
+        for ranked_lead in ranked:
+            yield ranked_lead
+    
+    def collect(self, ranked_leads: List[Dict], inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the step output from the leads astream() yielded in rank order"""
+        min_score = inputs.get('scoring_criteria', {}).get('thresholds', {}).get('min_score', 60)
         
         self.observe(f"Ranked {len(ranked_leads)} leads above threshold ({min_score})")
         
@@ -73,7 +129,33 @@ class ScoringAgent(BaseAgent):
         
         return output
     
-    def _calculate_score_breakdown(self, lead: Dict, weights: Dict) -> Dict[str, float]:
+    def _get_top_k(self, scoring_criteria: Dict[str, Any]) -> Optional[int]:
+        """
+        Read the optional top_k limit from the scoring criteria
+        
+        Args:
+            scoring_criteria: Scoring configuration
+            
+        Returns:
+            Number of leads to keep, or None to keep every qualifying lead
+            
+        Raises:
+            ValueError: If top_k is not a whole number of at least 1
+        """
+        top_k = scoring_criteria.get('top_k')
+        if top_k is None:
+            return None
+        
+        try:
+            # Also accepts numbers written as strings in workflow.json, e.g. "10"
+            value = int(top_k)
+        except (TypeError, ValueError):
+            raise ValueError(f"scoring top_k must be a whole number, got {top_k!r}") from None
+        if value < 1:
+            raise ValueError(f"scoring top_k must be at least 1, got {top_k!r}")
+        return value
+    
+    def _calculate_score_breakdown(self, lead: Lead, weights: Dict) -> Dict[str, float]:
         """
         Calculate individual score components
         
@@ -98,7 +180,7 @@ class ScoringAgent(BaseAgent):
         
         # Technology match score (0-100)
         # Score based on relevant technologies used
-        tech_score = self._score_technologies(lead.get('technologies', []))
+        tech_score = self._score_technologies(lead.technologies)
         breakdown['technology_match'] = tech_score * weights.get('technology_match', 0.2)
         
         # Signal strength score (0-100)
@@ -118,27 +200,12 @@ class ScoringAgent(BaseAgent):
         Returns:
             Score 0-100
         """
-        # High-value technologies that indicate good fit
-        valuable_tech = {
-            'Salesforce': 20,
-            'HubSpot': 20,
-            'AWS': 15,
-            'Azure': 15,
-            'Google Cloud': 15,
-            'Slack': 10,
-            'Zoom': 10,
-            'Docker': 10,
-            'Kubernetes': 10
-        }
-        
-        score = 0
-        for tech in technologies:
-            score += valuable_tech.get(tech, 5)  # Default 5 points for any tech
+        score = sum(_VALUABLE_TECH.get(tech, 5) for tech in technologies)
         
         # Cap at 100
         return min(score, 100)
     
-    def _score_signals(self, lead: Dict) -> float:
+    def _score_signals(self, lead: Lead) -> float:
         """
         Score based on buying signals
         
@@ -150,7 +217,7 @@ class ScoringAgent(BaseAgent):
         """
         score = 50  # Base score
         
-        recent_news = lead.get('recent_news', '').lower()
+        recent_news = lead.recent_news.lower()
         
         # Positive signals
         if 'funding' in recent_news or 'raised' in recent_news:
@@ -163,10 +230,10 @@ class ScoringAgent(BaseAgent):
             score += 10
         
         # VP/Director level contacts get bonus
-        role = lead.get('role', '').lower()
+        role = lead.role.lower()
         if 'vp' in role or 'vice president' in role:
             score += 10
         elif 'director' in role:
             score += 5
         
-        return min(score, 100)
\ No newline at end of file
+        return min(score, 100)
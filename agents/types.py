@@ -0,0 +1,71 @@
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional
+import numpy as np
+
+
+@dataclass
+class Lead:
+    """
+    A lead as the streaming agents read it
+
+    The builder converts each lead dictionary once, as it resolves a step's
+    inputs, so agents only ever see Lead records. Prospect search emits
+    'contact_name' and 'title' while later steps use 'contact' and 'role';
+    from_dict accepts either and fills missing values with empty ones.
+    Slots keep attribute access cheap in per-lead loops.
+    """
+
+    # Declared by hand rather than with slots=True so Python 3.9 is supported
+    __slots__ = ('company', 'contact', 'email', 'role',
+                 'technologies', 'company_description', 'recent_news', 'score')
+
+    company: str
+    contact: str
+    email: str
+    role: str
+    technologies: List[str]
+    company_description: str
+    recent_news: str
+    score: Optional[float]
+
+    @classmethod
+    def from_dict(cls, lead: Dict[str, Any]) -> 'Lead':
+        """Build a Lead from a lead dictionary produced by any step"""
+        return cls(
+            company=lead.get('company') or '',
+            contact=lead.get('contact') or lead.get('contact_name') or '',
+            email=lead.get('email') or '',
+            role=lead.get('role') or lead.get('title') or '',
+            technologies=lead.get('technologies') or [],
+            company_description=lead.get('company_description') or '',
+            recent_news=lead.get('recent_news') or '',
+            score=lead.get('score')
+        )
+
+    @property
+    def first_name(self) -> str:
+        """First word of the contact's name"""
+        # partition returns the prefix without building a list of every word
+        return self.contact.partition(' ')[0]
+
+
+def count_engagement(responses: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Count each engagement flag across the responses in a single pass"""
+    # A plain loop beats transposing into arrays: the responses are dicts, so
+    # any column would need its own Python-level pass before it could be summed
+    opened = clicked = replied = meetings = 0
+    for r in responses:
+        if r.get('opened', False):
+            opened += 1
+        if r.get('clicked', False):
+            clicked += 1
+        if r.get('replied', False):
+            replied += 1
+        if r.get('meeting_booked', False):
+            meetings += 1
+    return {'opened': opened, 'clicked': clicked, 'replied': replied, 'meeting_booked': meetings}
+
+
+def score_column(leads: List[Dict[str, Any]]) -> np.ndarray:
+    """Scores of a list of leads as a float array (missing scores count as 0)"""
+    return np.fromiter((lead.get('score', 0) for lead in leads), dtype=float, count=len(leads))
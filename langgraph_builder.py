@@ -3,10 +3,12 @@ LangGraph Builder - Main orchestrator for Prospect-to-Lead Workflow
 Dynamically builds and executes workflow from workflow.json
 """
 
+import argparse
 import json
+import logging
 import sys
 import re
-from typing import Dict, Any, TypedDict
+from typing import Dict, Any, List, Callable, Optional, TypedDict
 from datetime import datetime
 
 from langgraph.graph import StateGraph, END
@@ -17,6 +19,10 @@ from utils.validators import validate_workflow_json
 from utils.tool_loader import load_tools_config, replace_env_variables
 
 from agents import (
+    wait_for_background_writes,
+    run_async,
+    iterate_items,
+    buffered,
     ProspectSearchAgent,
     DataEnrichmentAgent,
     ScoringAgent,
@@ -25,6 +31,7 @@ from agents import (
     ResponseTrackerAgent,
     FeedbackTrainerAgent
 )
+from agents.types import count_engagement, score_column
 
 AGENT_REGISTRY = {
     'ProspectSearchAgent': ProspectSearchAgent,
@@ -36,6 +43,18 @@ AGENT_REGISTRY = {
     'FeedbackTrainerAgent': FeedbackTrainerAgent
 }
 
+# Matches a {{reference}} inside an input value
+_REF_RE = re.compile(r'\{\{([^}]+)\}\}')
+
+# Step keys (or a top-level "edges" list) that describe anything but a straight chain
+_BRANCHING_KEYS = frozenset({'next', 'branches', 'condition'})
+
+
+def _get_field(value: Any, key: str) -> Any:
+    """One step along a <step>.output.* path: descend into dicts, pass anything else through"""
+    return value.get(key, {}) if isinstance(value, dict) else value
+
+
 class WorkflowState(TypedDict):
     """State that flows through the workflow"""
     messages: list
@@ -46,11 +65,16 @@ class WorkflowState(TypedDict):
 class LangGraphWorkflowBuilder:
     """Builds and executes LangGraph workflow from JSON configuration"""
     
-    def __init__(self, workflow_path: str = 'workflow.json'):
-        self.logger = setup_logger('LangGraphBuilder', get_log_file_path())
+    def __init__(self, workflow_path: str = 'workflow.json', use_cache: bool = True):
+        log_file = get_log_file_path()
+        self.logger = setup_logger('LangGraphBuilder', log_file)
+        # Agents log their ReAct trace at DEBUG under the 'agents' logger
+        setup_logger('agents', log_file)
         self.workflow_path = workflow_path
+        self.use_cache = use_cache
         self.workflow_config = None
         self.graph = None
+        self._linear_steps = None
         
         self.logger.info("="*60)
         self.logger.info("LangGraph Workflow Builder Initialized")
@@ -70,63 +94,157 @@ class LangGraphWorkflowBuilder:
             self.logger.error(f"✗ Failed to load workflow: {e}")
             raise
     
-    def build_graph(self) -> StateGraph:
-        """Build LangGraph from workflow configuration"""
+    def build_graph(self) -> Optional[StateGraph]:
+        """
+        Build LangGraph from workflow configuration
+        
+        A workflow without branching keys is a straight chain, so its nodes are
+        kept in self._linear_steps and execute() calls them in order instead of
+        compiling a StateGraph; None is returned in that case.
+        """
         self.logger.info("\n📊 Building LangGraph...")
-        workflow = StateGraph(WorkflowState)
         
-        for step in self.workflow_config['steps']:
-            step_id = step['id']
-            agent_name = step['agent']
-            node_func = self._create_node_function(step)
-            workflow.add_node(step_id, node_func)
-            self.logger.info(f"  ✓ Added node: {step_id} ({agent_name})")
+        # Consecutive streaming steps share one node so items flow between them
+        stages = self._plan_stages(self.workflow_config['steps'])
+        nodes = []
+        
+        for stage in stages:
+            # Agents are built once here and every invocation of the graph runs a
+            # copy of them, so tool configs (and their env vars) are resolved only
+            # at build time
+            agents = [self._create_agent(step, load_tools_config(step)) for step in stage]
+            resolvers = [self._compile_resolver(step) for step in stage]
+            
+            if len(stage) == 1:
+                node_id = stage[0]['id']
+                node_func = self._create_node_function(stage[0], agents[0], resolvers[0])
+                self.logger.info(f"  ✓ Added node: {node_id} ({stage[0]['agent']})")
+            else:
+                node_id = '+'.join(step['id'] for step in stage)
+                node_func = self._create_pipeline_node_function(stage, agents, resolvers)
+                self.logger.info(f"  ✓ Added pipeline node: {node_id} "
+                                 f"({' → '.join(step['agent'] for step in stage)})")
+            nodes.append((node_id, node_func))
+        
+        if not self._has_branching():
+            self._linear_steps = nodes
+            self.logger.info(f"\n✓ Linear workflow: {' → '.join(node_id for node_id, _ in nodes)} → END")
+            return None
+        
+        workflow = StateGraph(WorkflowState)
+        for node_id, node_func in nodes:
+            workflow.add_node(node_id, node_func)
+        node_ids = [node_id for node_id, _ in nodes]
         
-        steps = self.workflow_config['steps']
-        workflow.set_entry_point(steps[0]['id'])
+        workflow.set_entry_point(node_ids[0])
         
-        for i in range(len(steps) - 1):
-            current_step = steps[i]['id']
-            next_step = steps[i + 1]['id']
+        for i in range(len(node_ids) - 1):
+            current_step = node_ids[i]
+            next_step = node_ids[i + 1]
             workflow.add_edge(current_step, next_step)
             self.logger.info(f"  ✓ Added edge: {current_step} → {next_step}")
         
-        workflow.add_edge(steps[-1]['id'], END)
-        self.logger.info(f"  ✓ Added edge: {steps[-1]['id']} → END")
+        workflow.add_edge(node_ids[-1], END)
+        self.logger.info(f"  ✓ Added edge: {node_ids[-1]} → END")
         
         self.graph = workflow.compile()
         self.logger.info("\n✓ LangGraph compiled successfully")
         return self.graph
     
-    def _create_node_function(self, step: Dict[str, Any]):
+    def _has_branching(self) -> bool:
+        """True if the workflow declares edges beyond the default step order"""
+        return 'edges' in self.workflow_config or any(
+            not _BRANCHING_KEYS.isdisjoint(step) for step in self.workflow_config['steps']
+        )
+    
+    def _plan_stages(self, steps: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Group consecutive steps that can stream items straight into each other"""
+        stages = []
+        for step in steps:
+            if (stages and self._streams_from(stages[-1][-1], step)
+                    and not self._reads_from_stage(stages[-1], step)):
+                stages[-1].append(step)
+            else:
+                stages.append([step])
+        return stages
+    
+    def _streams_from(self, upstream: Dict[str, Any], step: Dict[str, Any]) -> bool:
+        """True if `step` streams the list that `upstream` streams out"""
+        upstream_class = AGENT_REGISTRY.get(upstream['agent'])
+        agent_class = AGENT_REGISTRY.get(step['agent'])
+        if not (upstream_class and upstream_class.stream_output and agent_class and agent_class.stream_input):
+            return False
+        
+        expected_ref = f"{{{{{upstream['id']}.output.{upstream_class.stream_output}}}}}"
+        return step['inputs'].get(agent_class.stream_input) == expected_ref
+    
+    def _reads_from_stage(self, stage: List[Dict[str, Any]], step: Dict[str, Any]) -> bool:
+        """
+        True if `step` references anything from `stage` besides the list streamed into it
+        
+        A fused stage resolves all of its inputs before any of its steps has
+        run, so such a reference would only ever see the literal template.
+        """
+        stage_ids = {upstream['id'] for upstream in stage}
+        stream_input = AGENT_REGISTRY[step['agent']].stream_input
+        pending = [value for key, value in step['inputs'].items() if key != stream_input]
+        while pending:
+            value = pending.pop()
+            if isinstance(value, str):
+                if any(ref.split('.', 1)[0] in stage_ids for ref in _REF_RE.findall(value)):
+                    return True
+            elif isinstance(value, dict):
+                pending.extend(value.values())
+            elif isinstance(value, list):
+                pending.extend(value)
+        return False
+    
+    def _create_agent(self, step: Dict[str, Any], tools_config: Dict[str, Dict[str, Any]]):
+        """Instantiate the agent configured for a step"""
+        agent_class = AGENT_REGISTRY.get(step['agent'])
+        if not agent_class:
+            raise ValueError(f"Unknown agent: {step['agent']}")
+        
+        agent = agent_class(step, tools_config)
+        agent.use_cache = self.use_cache
+        return agent
+    
+    def _log_step_result(self, agent, output: Dict[str, Any]):
+        """Log a finished step's output keys and reasoning summary"""
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+        
+        self.logger.info(f"📤 Output keys: {list(output.keys())}")
+        reasoning = agent.get_reasoning_log()
+        self.logger.info(f"💭 Thoughts: {len(reasoning['thoughts'])}")
+        self.logger.info(f"🎬 Actions: {len(reasoning['actions'])}")
+    
+    def _create_node_function(self, step: Dict[str, Any], agent,
+                              resolve_inputs: Callable[[Dict[str, Any]], Dict[str, Any]]):
         def node_function(state: WorkflowState) -> WorkflowState:
             step_id = step['id']
             agent_class_name = step['agent']
             
-            self.logger.info(f"\n{'='*60}")
-            self.logger.info(f"🤖 Executing: {agent_class_name} (Step: {step_id})")
-            self.logger.info(f"{'='*60}")
+            # Banners are built only when INFO is enabled
+            log_info = self.logger.isEnabledFor(logging.INFO)
+            if log_info:
+                self.logger.info(f"\n{'='*60}")
+                self.logger.info(f"🤖 Executing: {agent_class_name} (Step: {step_id})")
+                self.logger.info(f"{'='*60}")
             
-            tools_config = load_tools_config(step)
-            agent_class = AGENT_REGISTRY.get(agent_class_name)
-            if not agent_class:
-                raise ValueError(f"Unknown agent: {agent_class_name}")
+            # A per-run copy, so concurrent runs never share a reasoning log
+            run_agent = agent.for_run()
+            inputs = self._as_records(agent, resolve_inputs(state['step_outputs']))
             
-            agent = agent_class(step, tools_config)
-            inputs = self._resolve_inputs(step['inputs'], state['step_outputs'], 
-                                         self.workflow_config.get('config', {}))
-            
-            self.logger.info(f"📥 Inputs: {list(inputs.keys())}")
+            if log_info:
+                self.logger.info(f"📥 Inputs: {list(inputs.keys())}")
             
             try:
-                output = agent.execute(inputs)
+                output = run_agent.execute(inputs)
                 state['step_outputs'][step_id] = output
                 state['current_step'] = step_id
                 
-                self.logger.info(f"📤 Output keys: {list(output.keys())}")
-                reasoning = agent.get_reasoning_log()
-                self.logger.info(f"💭 Thoughts: {len(reasoning['thoughts'])}")
-                self.logger.info(f"🎬 Actions: {len(reasoning['actions'])}")
+                self._log_step_result(run_agent, output)
                 
                 return state
             except Exception as e:
@@ -135,39 +253,143 @@ class LangGraphWorkflowBuilder:
         
         return node_function
     
-    def _resolve_inputs(self, input_config: Dict, step_outputs: Dict, 
-                       workflow_config: Dict) -> Dict[str, Any]:
-        def resolve_value(value):
+    def _create_pipeline_node_function(self, stage: List[Dict[str, Any]], agents: List[Any],
+                                       resolvers: List[Callable[[Dict[str, Any]], Dict[str, Any]]]):
+        def node_function(state: WorkflowState) -> WorkflowState:
+            # Banners are built only when INFO is enabled
+            log_info = self.logger.isEnabledFor(logging.INFO)
+            if log_info:
+                self.logger.info(f"\n{'='*60}")
+                self.logger.info(f"🔗 Pipelining: {' → '.join(step['agent'] for step in stage)}")
+                self.logger.info(f"{'='*60}")
+            
+            # Per-run copies, so concurrent runs never share a reasoning log
+            run_agents = [agent.for_run() for agent in agents]
+            inputs_list = [resolve_inputs(state['step_outputs']) for resolve_inputs in resolvers]
+            
+            try:
+                outputs = run_async(self._run_pipeline(run_agents, inputs_list))
+            except Exception as e:
+                self.logger.error(f"✗ Agent execution failed: {e}")
+                raise
+            
+            for step, agent, output in zip(stage, run_agents, outputs):
+                if log_info:
+                    self.logger.info(f"🤖 {step['agent']} (Step: {step['id']})")
+                state['step_outputs'][step['id']] = output
+                self._log_step_result(agent, output)
+            
+            state['current_step'] = stage[-1]['id']
+            return state
+        
+        return node_function
+    
+    async def _run_pipeline(self, agents: List[Any], inputs_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Chain the agents' astream() calls so each item flows to the next stage
+        as soon as it is ready; bounded queues between stages cap memory.
+        Total latency approaches the slowest stage rather than the sum.
+        """
+        stream = iterate_items(inputs_list[0].get(agents[0].stream_input, []))
+        streams = [stream]
+        stage_results = []
+        
+        for agent, inputs in zip(agents, inputs_list):
+            if agent.stream_record_type is not None:
+                stream = self._stream_records(stream, agent.stream_record_type)
+                streams.append(stream)
+            results = []
+            stage = agent.astream(stream, inputs)
+            recorded = self._record(stage, results)
+            stream = buffered(recorded)
+            streams.extend((stage, recorded, stream))
+            stage_results.append(results)
+        
+        try:
+            # Drain the final stage; every stage records what it produced on the way
+            async for _ in stream:
+                pass
+        finally:
+            # A failing stage leaves the ones before it suspended mid-stream, so
+            # close every generator, downstream first, to cancel their pending work
+            for stream in reversed(streams):
+                await stream.aclose()
+        
+        return [
+            agent.collect(results, inputs)
+            for agent, results, inputs in zip(agents, stage_results, inputs_list)
+        ]
+    
+    @staticmethod
+    def _as_records(agent, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert the list a streaming agent handles into its record type, once per step"""
+        record_type = agent.stream_record_type
+        if record_type is not None and agent.stream_input in inputs:
+            inputs[agent.stream_input] = [record_type.from_dict(item) for item in inputs[agent.stream_input]]
+        return inputs
+    
+    @staticmethod
+    async def _stream_records(stream, record_type):
+        """Convert each item flowing into a pipelined stage into the stage's record type"""
+        async for item in stream:
+            yield record_type.from_dict(item)
+    
+    @staticmethod
+    async def _record(stream, results: List[Any]):
+        """Pass a stream through unchanged while appending each item to results"""
+        async for item in stream:
+            results.append(item)
+            yield item
+    
+    def _compile_resolver(self, step: Dict[str, Any]) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Compile a step's input template into a function of the step outputs
+        
+        The template is walked once, here. Literals become Python literals and
+        {{config.*}} references are resolved now and bound as constants.
+        {{<step>.output.*}} references become direct lookups into
+        step_outputs. A value containing a reference is replaced by what it
+        refers to; a step reference whose step has not run yet stays as the
+        original string.
+        """
+        workflow_config = self.workflow_config.get('config', {})
+        constants: List[Any] = []
+        
+        def constant(value: Any) -> str:
+            constants.append(value)
+            return f"_c[{len(constants) - 1}]"
+        
+        def emit(value: Any) -> str:
             if isinstance(value, str):
-                pattern = r'\{\{([^}]+)\}\}'
-                match = re.search(pattern, value)
-                
+                # Most templated values are exactly one reference, so try fullmatch first
+                match = _REF_RE.fullmatch(value) or _REF_RE.search(value)
                 if match:
-                    ref_path = match.group(1)
-                    parts = ref_path.split('.')
-                    
+                    parts = match.group(1).split('.')
                     if parts[0] == 'config':
                         result = workflow_config
                         for part in parts[1:]:
                             result = result.get(part, {})
-                        return result
+                        return constant(result)
                     elif len(parts) >= 3:
-                        step_id = parts[0]
-                        if step_id in step_outputs:
-                            result = step_outputs[step_id]
-                            for part in parts[2:]:
-                                if isinstance(result, dict):
-                                    result = result.get(part, {})
-                            return result
-                return value
+                        expr = f"so[{parts[0]!r}]"
+                        for part in parts[2:]:
+                            expr = f"_get({expr}, {part!r})"
+                        return f"({expr} if {parts[0]!r} in so else {value!r})"
+                return repr(value)
             elif isinstance(value, dict):
-                return {k: resolve_value(v) for k, v in value.items()}
+                items = (f"{repr(k) if isinstance(k, str) else constant(k)}: {emit(v)}" for k, v in value.items())
+                return '{' + ', '.join(items) + '}'
             elif isinstance(value, list):
-                return [resolve_value(item) for item in value]
+                return '[' + ', '.join(emit(item) for item in value) + ']'
+            elif value is None or isinstance(value, (bool, int)):
+                return repr(value)
             else:
-                return value
+                return constant(value)
         
-        return resolve_value(input_config)
+        source = f"def resolve_inputs(so):\n    return {emit(step['inputs'])}\n"
+        namespace = {'_c': constants, '_get': _get_field}
+        exec(compile(source, f"<inputs of {step['id']}>", 'exec'), namespace)
+        return namespace['resolve_inputs']
     
     def execute(self) -> Dict[str, Any]:
         self.logger.info("\n" + "="*60)
@@ -184,7 +406,14 @@ class LangGraphWorkflowBuilder:
         }
         
         try:
-            final_state = self.graph.invoke(initial_state)
+            if self._linear_steps is not None:
+                # Each node updates the state in place and returns it
+                final_state = initial_state
+                for _, node_func in self._linear_steps:
+                    final_state = node_func(final_state)
+            else:
+                final_state = self.graph.invoke(initial_state)
+            wait_for_background_writes()
             end_time = datetime.now()
             duration = (end_time - start_time).total_seconds()
             
@@ -215,7 +444,7 @@ class LangGraphWorkflowBuilder:
         if 'scoring' in step_outputs:
             ranked = step_outputs['scoring'].get('ranked_leads', [])
             if ranked:
-                avg_score = sum(l['score'] for l in ranked) / len(ranked)
+                avg_score = score_column(ranked).mean()
                 print(f"⭐ Lead Scoring: {len(ranked)} qualified leads")
                 print(f"   Average score: {avg_score:.1f}/100")
                 print(f"   Top lead: {ranked[0]['company']} ({ranked[0]['score']:.1f})")
@@ -231,9 +460,10 @@ class LangGraphWorkflowBuilder:
         
         if 'response_tracking' in step_outputs:
             responses = step_outputs['response_tracking'].get('responses', [])
-            opened = sum(1 for r in responses if r.get('opened'))
-            replied = sum(1 for r in responses if r.get('replied'))
-            meetings = sum(1 for r in responses if r.get('meeting_booked'))
+            counts = count_engagement(responses)
+            opened = counts['opened']
+            replied = counts['replied']
+            meetings = counts['meeting_booked']
             print(f"📈 Response Tracking:")
             print(f"   Opens: {opened}/{len(responses)}")
             print(f"   Replies: {replied}/{len(responses)}")
@@ -251,13 +481,18 @@ class LangGraphWorkflowBuilder:
 
 def main():
     """Main entry point"""
+    parser = argparse.ArgumentParser(description="Run the prospect-to-lead workflow")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Ignore cached API responses and query the APIs again")
+    args = parser.parse_args()
+    
     print("\n" + "🤖 "*20)
     print("   LANGGRAPH PROSPECT-TO-LEAD WORKFLOW")
     print("   Autonomous AI Agent System")
     print("🤖 "*20 + "\n")
     
     try:
-        builder = LangGraphWorkflowBuilder()
+        builder = LangGraphWorkflowBuilder(use_cache=not args.no_cache)
         builder.load_workflow()
         builder.build_graph()
         results = builder.execute()
@@ -0,0 +1,112 @@
+"""
+Tests for the compiled input resolvers in langgraph_builder
+
+Each case compares LangGraphWorkflowBuilder._compile_resolver against
+reference_resolve_inputs, the interpretive resolver it replaced, so the
+generated code has to reproduce that behaviour exactly.
+"""
+
+import re
+
+import pytest
+
+from langgraph_builder import LangGraphWorkflowBuilder
+
+
+WORKFLOW_CONFIG = {
+    'scoring': {
+        'weights': {'revenue_match': 0.3, 'signal_strength': 0.7},
+        'thresholds': {'min_score': 60}
+    }
+}
+
+STEP_OUTPUTS = {
+    'prospect_search': {'leads': [{'company': 'Acme'}], 'meta': {'page': {'number': 2}}},
+    'enrichment': {'enriched_leads': []},
+    'scalar': {'count': 5, 'label': 'done'},
+    'listed': ['not', 'a', 'dict']
+}
+
+
+def reference_resolve_inputs(input_config, step_outputs, workflow_config):
+    """The resolver that walked the input template on every call"""
+    def resolve_value(value):
+        if isinstance(value, str):
+            match = re.search(r'\{\{([^}]+)\}\}', value)
+
+            if match:
+                parts = match.group(1).split('.')
+
+                if parts[0] == 'config':
+                    result = workflow_config
+                    for part in parts[1:]:
+                        result = result.get(part, {})
+                    return result
+                elif len(parts) >= 3:
+                    step_id = parts[0]
+                    if step_id in step_outputs:
+                        result = step_outputs[step_id]
+                        for part in parts[2:]:
+                            if isinstance(result, dict):
+                                result = result.get(part, {})
+                        return result
+            return value
+        elif isinstance(value, dict):
+            return {k: resolve_value(v) for k, v in value.items()}
+        elif isinstance(value, list):
+            return [resolve_value(item) for item in value]
+        else:
+            return value
+
+    return resolve_value(input_config)
+
+
+def compile_resolver(inputs):
+    """Compile a resolver for a step with the given input template"""
+    builder = LangGraphWorkflowBuilder.__new__(LangGraphWorkflowBuilder)
+    builder.workflow_config = {'config': WORKFLOW_CONFIG}
+    return builder._compile_resolver({'id': 'step_under_test', 'inputs': inputs})
+
+
+@pytest.mark.parametrize('inputs', [
+    # Plain step and config references
+    {'leads': '{{prospect_search.output.leads}}', 'criteria': '{{config.scoring}}'},
+    # Nested references, inside dicts and lists
+    {'page': '{{prospect_search.output.meta.page.number}}',
+     'nested': {'deeper': ['{{config.scoring.weights.revenue_match}}', {'x': '{{enrichment.output.enriched_leads}}'}]}},
+    # Missing keys resolve to {} at any depth
+    {'missing_key': '{{prospect_search.output.nope}}',
+     'missing_nested': '{{prospect_search.output.meta.nope.deeper}}',
+     'missing_config': '{{config.scoring.nope}}'},
+    # A step that has not run keeps the original string
+    {'not_run': '{{feedback_trainer.output.metrics}}'},
+    # Non-dict intermediates are passed through rather than descended into
+    {'scalar': '{{scalar.output.count.more}}',
+     'string': '{{scalar.output.label.length}}',
+     'list_output': '{{listed.output.anything}}'},
+    # References embedded in text resolve to the referenced value
+    {'embedded': 'Leads: {{prospect_search.output.leads}} (first page)'},
+    # Too short to be a step reference
+    {'short': '{{prospect_search.output}}', 'bare': '{{prospect_search}}'},
+    # Literal values of every JSON type
+    {'text': 'friendly and professional', 'flag': True, 'off': False, 'none': None,
+     'count': 10, 'ratio': 0.25, 'items': ['a', 1, None], 'empty': {}, 'empty_list': []},
+])
+def test_compiled_resolver_matches_reference(inputs):
+    resolve_inputs = compile_resolver(inputs)
+    expected = reference_resolve_inputs(inputs, STEP_OUTPUTS, WORKFLOW_CONFIG)
+
+    assert resolve_inputs(STEP_OUTPUTS) == expected
+    assert resolve_inputs({}) == reference_resolve_inputs(inputs, {}, WORKFLOW_CONFIG)
+
+
+def test_compiled_resolver_returns_fresh_containers():
+    inputs = {'icp': {'industry': ['SaaS']}, 'signals': ['recent_funding']}
+    resolve_inputs = compile_resolver(inputs)
+
+    first = resolve_inputs(STEP_OUTPUTS)
+    first['icp']['industry'].append('Fintech')
+    first['signals'].clear()
+
+    assert resolve_inputs(STEP_OUTPUTS) == inputs
+    assert inputs == {'icp': {'industry': ['SaaS']}, 'signals': ['recent_funding']}
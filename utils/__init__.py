@@ -1,6 +1,6 @@
 from .logger import setup_logger, get_log_file_path
-from .tool_loader import load_tools_config, replace_env_variables, get_env_variable
-from .validators import validate_workflow_json, validate_step_output
+from .tool_loader import load_tools_config, replace_env_variables, get_env_variable, clear_env_cache
+from .validators import validate_workflow_json, validate_step_output, clear_workflow_cache, get_schema
 
 __all__ = [
     'setup_logger',
@@ -8,6 +8,9 @@ __all__ = [
     'load_tools_config',
     'replace_env_variables',
     'get_env_variable',
+    'clear_env_cache',
     'validate_workflow_json',
-    'validate_step_output'
+    'validate_step_output',
+    'clear_workflow_cache',
+    'get_schema'
 ]
\ No newline at end of file
@@ -1,34 +1,107 @@
+import atexit
 import logging
 import os
+import queue
 import sys
+from functools import lru_cache
+from logging.handlers import MemoryHandler, QueueHandler, QueueListener, RotatingFileHandler
 from datetime import datetime
 from colorama import Fore, Style, init
 
 # Initialize colorama
 init(autoreset=True)
 
+# File records are buffered and written in batches; ERROR and above flush immediately
+LOG_BUFFER_CAPACITY = 8192
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+# Loggers writing to the same file share one buffered handler
+_file_handlers = {}
+
+# Log directories already created by this process
+_MADE_DIRS = set()
+
+# Names of the loggers setup_logger has already configured
+_CONFIGURED = set()
+
 class ColoredFormatter(logging.Formatter):
-    """Custom formatter with colors for different log levels"""
+    """
+    Custom formatter with colors for different log levels
+    
+    Format strings should use %(colored_levelname)s; record.levelname is
+    left untouched for the other handlers formatting the same record.
+    """
     
     COLORS = {
-        'DEBUG': Fore.CYAN,
-        'INFO': Fore.GREEN,
-        'WARNING': Fore.YELLOW,
-        'ERROR': Fore.RED,
-        'CRITICAL': Fore.RED + Style.BRIGHT,
+        logging.DEBUG: Fore.CYAN,
+        logging.INFO: Fore.GREEN,
+        logging.WARNING: Fore.YELLOW,
+        logging.ERROR: Fore.RED,
+        logging.CRITICAL: Fore.RED + Style.BRIGHT,
     }
+    
+    # Colored level names by levelno, built once instead of per record
+    COLORED_LEVELNAMES = {
+        levelno: f"{color}{logging.getLevelName(levelno)}{Style.RESET_ALL}"
+        for levelno, color in COLORS.items()
+    }
+
+    def __init__(self, *args, use_color: bool = True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.use_color = use_color
 
     def format(self, record):
-        levelname = record.levelname
-        if levelname in self.COLORS:
-            record.levelname = f"{self.COLORS[levelname]}{levelname}{Style.RESET_ALL}"
+        if self.use_color:
+            record.colored_levelname = self.COLORED_LEVELNAMES.get(record.levelno, record.levelname)
+        else:
+            record.colored_levelname = record.levelname
         return super().format(record)
 
 
+class _RoutedQueueHandler(QueueHandler):
+    """Queue handler that tags each record with the logger it was attached to"""
+
+    def __init__(self, log_queue, route: str):
+        super().__init__(log_queue)
+        self.route = route
+
+    def prepare(self, record):
+        # prepare() works on a copy, so the caller's record is left untouched
+        record = super().prepare(record)
+        record.log_route = self.route
+        return record
+
+
+class _RoutingHandler(logging.Handler):
+    """Passes each record off the shared queue to the handlers of the logger that queued it"""
+
+    def __init__(self):
+        super().__init__()
+        self.routes = {}
+
+    def handle(self, record):
+        for handler in self.routes.get(record.log_route, ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+        return True
+
+
+# Every configured logger feeds one queue drained by a single listener thread,
+# so records from different loggers are written in the order they were logged
+_log_queue = queue.Queue(-1)
+_router = _RoutingHandler()
+_listener = None
+
+
 def setup_logger(name: str, log_file: str = None, level=logging.INFO):
     """
     Set up a logger with both console and file handlers
     
+    Records are handed to a single background QueueListener shared by all
+    loggers, so logging calls never block on console or disk I/O. File output is buffered in a
+    MemoryHandler and flushed in batches, on errors, and at exit.
+    
     Args:
         name: Logger name
         log_file: Optional log file path
@@ -37,13 +110,13 @@ def setup_logger(name: str, log_file: str = None, level=logging.INFO):
     Returns:
         logging.Logger: Configured logger
     """
+    # Avoid adding handlers multiple times
+    if name in _CONFIGURED:
+        return logging.getLogger(name)
+    
     logger = logging.getLogger(name)
     logger.setLevel(level)
     
-    # Avoid adding handlers multiple times
-    if logger.handlers:
-        return logger
-    
     # Console handler with colors (UTF-8 encoding for Windows)
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(level)
@@ -54,28 +127,54 @@ def setup_logger(name: str, log_file: str = None, level=logging.INFO):
     except AttributeError:
         pass  # Python < 3.7
     
+    # Colors only help on a terminal; piped or captured output stays plain
     console_format = ColoredFormatter(
-        '%(levelname)s | %(name)s | %(message)s'
+        '%(colored_levelname)s | %(name)s | %(message)s',
+        use_color=console_handler.stream.isatty()
     )
     console_handler.setFormatter(console_format)
-    logger.addHandler(console_handler)
+    handlers = [console_handler]
     
     # File handler (if log file specified)
-    if log_file:
-        os.makedirs(os.path.dirname(log_file), exist_ok=True)
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
-        file_handler.setLevel(level)
+    if log_file and log_file in _file_handlers:
+        handlers.append(_file_handlers[log_file])
+    elif log_file:
+        log_dir = os.path.dirname(log_file)
+        if log_dir and log_dir not in _MADE_DIRS:
+            os.makedirs(log_dir, exist_ok=True)
+            _MADE_DIRS.add(log_dir)
+        file_handler = RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES,
+                                           backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
         file_format = logging.Formatter(
             '%(asctime)s | %(levelname)s | %(name)s | %(message)s',
             datefmt='%Y-%m-%d %H:%M:%S'
         )
         file_handler.setFormatter(file_format)
-        logger.addHandler(file_handler)
+        buffer_handler = MemoryHandler(LOG_BUFFER_CAPACITY, flushLevel=logging.ERROR, target=file_handler)
+        buffer_handler.setLevel(level)
+        _file_handlers[log_file] = buffer_handler
+        handlers.append(buffer_handler)
+    
+    # The logger only enqueues records; the listener thread formats and writes them
+    global _listener
+    _router.routes[name] = handlers
+    if _listener is None:
+        _listener = QueueListener(_log_queue, _router)
+        _listener.start()
+        atexit.register(_listener.stop)
+    logger.addHandler(_RoutedQueueHandler(_log_queue, name))
+    _CONFIGURED.add(name)
     
     return logger
 
 
+@lru_cache(maxsize=1)
 def get_log_file_path():
-    """Generate a log file path with timestamp"""
+    """
+    Generate a log file path with timestamp
+    
+    The path is computed once, so every logger in the process shares one log
+    file per run; call get_log_file_path.cache_clear() to start a new one.
+    """
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     return f"logs/workflow_{timestamp}.log"
\ No newline at end of file
@@ -1,11 +1,46 @@
 import os
 import re
-from typing import Dict, Any
+from functools import lru_cache
+from typing import Dict, Any, List, Tuple
 from dotenv import load_dotenv
+from .logger import setup_logger
 
 # Load environment variables
 load_dotenv()
 
+logger = setup_logger(__name__)
+
+# Matches an {{ENV_VAR_NAME}} placeholder
+_PLACEHOLDER_RE = re.compile(r'\{\{([A-Z_]+)\}\}')
+
+
+@lru_cache(maxsize=None)
+def _resolve_env(name: str) -> str:
+    """Value of an environment variable, looked up (and warned about) once per process"""
+    env_value = os.getenv(name, '')
+    if not env_value:
+        logger.warning(f"Environment variable {name} not found")
+    return env_value
+
+
+def _env_sub(match: re.Match) -> str:
+    """re.sub callback returning the value of the environment variable a placeholder names"""
+    return _resolve_env(match.group(1))
+
+
+def clear_env_cache():
+    """Forget resolved environment variables, e.g. after changing os.environ"""
+    _resolve_env.cache_clear()
+
+
+def _replace_string(value: str) -> str:
+    """Replace the {{VAR_NAME}} placeholders in a single string"""
+    # Most values hold no placeholder at all; skip the regex for them
+    if '{{' not in value:
+        return value
+    # Substitute every {{VAR_NAME}} in one pass over the string
+    return _PLACEHOLDER_RE.sub(_env_sub, value)
+
 
 def replace_env_variables(config: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -13,33 +48,38 @@ def replace_env_variables(config: Dict[str, Any]) -> Dict[str, Any]:
     
     Placeholders format: {{ENV_VAR_NAME}}
     
+    Nested dicts and lists are walked with an explicit stack rather than
+    recursion. Containers are copied on the way down, so the input (often
+    the shared, cached workflow definition) is never mutated.
+    
     Args:
         config: Configuration dictionary
         
     Returns:
         Dict with environment variables replaced
     """
-    def replace_value(value):
-        if isinstance(value, str):
-            # Find all {{VAR_NAME}} patterns
-            pattern = r'\{\{([A-Z_]+)\}\}'
-            matches = re.findall(pattern, value)
-            
-            for match in matches:
-                env_value = os.getenv(match, '')
-                if not env_value:
-                    print(f"Warning: Environment variable {match} not found")
-                value = value.replace(f'{{{{{match}}}}}', env_value)
-            
-            return value
-        elif isinstance(value, dict):
-            return {k: replace_value(v) for k, v in value.items()}
-        elif isinstance(value, list):
-            return [replace_value(item) for item in value]
-        else:
-            return value
+    if isinstance(config, str):
+        return _replace_string(config)
+    if not isinstance(config, (dict, list)):
+        return config
+    
+    root = dict(config) if isinstance(config, dict) else list(config)
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        # Values are reassigned in place on the copies; no keys are added or removed
+        for key in (node.keys() if isinstance(node, dict) else range(len(node))):
+            value = node[key]
+            if isinstance(value, str):
+                node[key] = _replace_string(value)
+            elif isinstance(value, dict):
+                node[key] = child = dict(value)
+                stack.append(child)
+            elif isinstance(value, list):
+                node[key] = child = list(value)
+                stack.append(child)
     
-    return replace_value(config)
+    return root
 
 
 def load_tools_config(step: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
@@ -79,6 +119,22 @@ def get_env_variable(name: str, default: str = None) -> str:
     return value
 
 
+def check_api_keys(required_keys: list) -> Tuple[bool, List[str]]:
+    """
+    Check which required API keys are not set
+    
+    Args:
+        required_keys: List of required environment variable names
+        
+    Returns:
+        (True if all keys are set, list of missing keys in the given order)
+    """
+    environ = os.environ
+    # Keys set to an empty string count as missing
+    missing_keys = [key for key in required_keys if not environ.get(key)]
+    return not missing_keys, missing_keys
+
+
 def validate_api_keys(required_keys: list) -> bool:
     """
     Validate that required API keys are set
@@ -89,14 +145,8 @@ def validate_api_keys(required_keys: list) -> bool:
     Returns:
         True if all keys are set, False otherwise
     """
-    missing_keys = []
-    
-    for key in required_keys:
-        if not os.getenv(key):
-            missing_keys.append(key)
-    
-    if missing_keys:
-        print(f"Missing required API keys: {', '.join(missing_keys)}")
-        return False
+    ok, missing_keys = check_api_keys(required_keys)
+    if not ok:
+        logger.error(f"Missing required API keys: {', '.join(missing_keys)}")
     
-    return True
\ No newline at end of file
+    return ok
\ No newline at end of file
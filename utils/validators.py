@@ -1,6 +1,14 @@
-import json
-from typing import Dict, Any, List
+import hashlib
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Any, Callable, List, Tuple, Type
+import fastjsonschema
+import orjson
 from pydantic import BaseModel, Field, ValidationError
+from .logger import setup_logger
+
+logger = setup_logger(__name__)
 
 
 class ICPConfig(BaseModel):
@@ -29,10 +37,30 @@ class WorkflowConfig(BaseModel):
     steps: List[WorkflowStep]
 
 
+@lru_cache(maxsize=None)
+def get_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    JSON Schema of a workflow model, generated once per process
+    
+    The returned dictionary is shared between callers and must not be mutated.
+    
+    Args:
+        model: Pydantic model class, e.g. WorkflowStep
+        
+    Returns:
+        The model's JSON Schema
+    """
+    return model.model_json_schema()
+
+
 def validate_workflow_json(workflow_path: str) -> Dict[str, Any]:
     """
     Validate workflow JSON file against schema
     
+    Results are cached per (path, modification time), so an unchanged file
+    is parsed and validated once per process. The returned dictionary is
+    shared between callers and must not be mutated.
+    
     Args:
         workflow_path: Path to workflow.json file
         
@@ -44,25 +72,118 @@ def validate_workflow_json(workflow_path: str) -> Dict[str, Any]:
         FileNotFoundError: If workflow file doesn't exist
     """
     try:
-        with open(workflow_path, 'r') as f:
-            workflow_data = json.load(f)
+        mtime_ns = os.stat(workflow_path).st_mtime_ns
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Workflow file not found: {workflow_path}")
+    
+    return _load_workflow(workflow_path, mtime_ns)
+
+
+@lru_cache(maxsize=8)
+def _load_workflow(workflow_path: str, mtime_ns: int) -> Dict[str, Any]:
+    """Parse and validate a workflow file; mtime_ns is part of the cache key only"""
+    try:
+        with open(workflow_path, 'rb') as f:
+            workflow_data = orjson.loads(f.read())
         
         # Validate using Pydantic
-        workflow = WorkflowConfig(**workflow_data)
+        workflow = WorkflowConfig.model_validate(workflow_data)
         
-        print(f"✓ Workflow '{workflow.workflow_name}' validated successfully")
-        print(f"  Steps: {len(workflow.steps)}")
+        logger.info(f"✓ Workflow '{workflow.workflow_name}' validated successfully")
+        logger.info(f"  Steps: {len(workflow.steps)}")
         
         return workflow_data
         
     except FileNotFoundError:
         raise FileNotFoundError(f"Workflow file not found: {workflow_path}")
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         raise ValueError(f"Invalid JSON in workflow file: {e}")
     except ValidationError as e:
         raise ValueError(f"Workflow validation failed: {e}")
 
 
+def clear_workflow_cache():
+    """Drop cached workflow files so the next validate_workflow_json call re-reads them"""
+    _load_workflow.cache_clear()
+
+
+# Matches a {{step.output.field}} variable reference
+_VAR_RE = re.compile(r'\{\{([^}]+)\}\}')
+
+# Type names allowed as leaf values in an example-style output_schema
+_JSON_SCHEMA_TYPES = frozenset({'string', 'number', 'integer', 'boolean', 'array', 'object'})
+
+
+def output_schema_to_json_schema(example: Any) -> Dict[str, Any]:
+    """
+    Convert an example-style output_schema from workflow.json into JSON Schema
+    
+    The top-level keys are required, as the step outputs are built from
+    them. Anything nested only constrains the values that are present: API
+    records routinely omit fields or leave them null, so nested keys are
+    optional and every typed value also accepts null.
+    
+    Args:
+        example: output_schema from a workflow step
+        
+    Returns:
+        Equivalent JSON Schema dictionary
+    """
+    schema = _example_to_schema(example)
+    if isinstance(example, dict):
+        schema['type'] = 'object'
+        schema['required'] = list(example.keys())
+    return schema
+
+
+def _example_to_schema(example: Any) -> Dict[str, Any]:
+    """
+    JSON Schema for one value of an example-style output_schema
+    
+    Dicts become objects, a one-element list describes the items of an
+    array, and strings such as "string" or "number" become type
+    constraints; each of these also allows null.
+    """
+    if isinstance(example, dict):
+        return {
+            'type': ['object', 'null'],
+            'properties': {key: _example_to_schema(value) for key, value in example.items()}
+        }
+    if isinstance(example, list):
+        schema = {'type': ['array', 'null']}
+        if example:
+            schema['items'] = _example_to_schema(example[0])
+        return schema
+    if isinstance(example, str) and example in _JSON_SCHEMA_TYPES:
+        return {'type': [example, 'null']}
+    return {}
+
+
+# Compiled validators by a hash of the output_schema's content, so steps (and
+# rebuilt agents) with the same schema share one validator
+_step_validators: Dict[str, Callable[[Any], Any]] = {}
+
+
+def get_output_validator(output_schema: Dict[str, Any]) -> Callable[[Any], Any]:
+    """
+    Compiled fastjsonschema validator for an example-style output_schema
+    
+    Validators are compiled on first use and cached by schema content.
+    
+    Args:
+        output_schema: output_schema from a workflow step
+        
+    Returns:
+        Function that raises fastjsonschema.JsonSchemaException on invalid data
+    """
+    key = hashlib.blake2b(orjson.dumps(output_schema, option=orjson.OPT_SORT_KEYS)).hexdigest()
+    validator = _step_validators.get(key)
+    if validator is None:
+        validator = fastjsonschema.compile(output_schema_to_json_schema(output_schema))
+        _step_validators[key] = validator
+    return validator
+
+
 def validate_step_output(step_id: str, output: Any, expected_schema: Dict[str, Any]) -> bool:
     """
     Validate step output against expected schema
@@ -70,35 +191,36 @@ def validate_step_output(step_id: str, output: Any, expected_schema: Dict[str, A
     Args:
         step_id: Step identifier
         output: Output data to validate
-        expected_schema: Expected output schema
+        expected_schema: Expected output schema (example-style, as in workflow.json)
         
     Returns:
         True if valid, False otherwise
     """
     if not isinstance(output, dict):
-        print(f"Warning: Step '{step_id}' output is not a dictionary")
+        logger.warning(f"Step '{step_id}' output is not a dictionary")
         return False
     
-    # Check for required top-level keys
-    for key in expected_schema.keys():
-        if key not in output:
-            print(f"Warning: Step '{step_id}' missing required output key: {key}")
-            return False
+    try:
+        get_output_validator(expected_schema)(output)
+    except fastjsonschema.JsonSchemaException as e:
+        logger.warning(f"Step '{step_id}' output does not match schema: {e.message}")
+        return False
     
     return True
 
 
-def extract_variable_references(value: str) -> List[str]:
+@lru_cache(maxsize=4096)
+def extract_variable_references(value: str) -> Tuple[str, ...]:
     """
     Extract variable references from string like {{step.output.field}}
     
+    Results are memoized per string, since the same templates recur across
+    steps; a tuple is returned so the cached value cannot be modified.
+    
     Args:
         value: String that may contain variable references
         
     Returns:
-        List of variable reference paths
+        Tuple of variable reference paths
     """
-    import re
-    pattern = r'\{\{([^}]+)\}\}'
-    matches = re.findall(pattern, value)
-    return matches
\ No newline at end of file
+    return tuple(_VAR_RE.findall(value))
\ No newline at end of file